@@ -3,13 +3,14 @@ import pandas as pd
 import smogn
 
 
-def balancing_kmeans(df, n_cluster):
+def balancing_kmeans(df, n_cluster, random_state=None):
     """
     Balances the DataFrame `df` using the K-means clustering technique.
 
     Args:
     df (pd.DataFrame): The DataFrame containing the data to be balanced. It is assumed to have a column named 'esg'.
     n_cluster (int): The number of clusters to be used in the K-means algorithm.
+    random_state (int, optional): Seed of the oversampling, for a reproducible balanced set. Defaults to None.
 
     Returns:
     tuple: Two objects (X_balanced, y_balanced) where:
@@ -31,7 +32,7 @@ def balancing_kmeans(df, n_cluster):
 
     for cluster in data_balanced['cluster'].unique():
         df_cluster = data_balanced[data_balanced['cluster'] == cluster]
-        lst.append(df_cluster.sample(max_size - len(df_cluster), replace=True))
+        lst.append(df_cluster.sample(max_size - len(df_cluster), replace=True, random_state=random_state))
 
     data_balanced = pd.concat(lst)
     data_balanced.drop(columns=['cluster'], inplace=True)
@@ -0,0 +1,106 @@
+"""
+Timings of the vectorized data-preparation steps against the row-wise code they replaced. The reference
+implementations are also used by the parity tests in tests/test_data_preparation.py.
+
+Usage:
+    Run this module from the data_preparation directory; it reads ../data/raw.csv.
+"""
+
+import json
+import timeit
+
+import numpy as np
+import pandas as pd
+from data_preparation.cleaning import INVOLVEMENT_GROUPS, merge_columns_function, merge_involvement
+from data_preparation.encoding import ENCODINGS, involvement_encoding, encoding_colors, encoding_aligned_no
+from data_preparation.metrics import METRIC_WEIGHTS_PATH, load_metric_weights, merge_by_esg
+
+RAW_PATH = '../data/raw.csv'
+
+
+def best_time(func, repeat=5):
+    """
+    Returns the best wall time of `func` over `repeat` runs, in seconds.
+    """
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def merge_involvement_rowwise(df):
+    """
+    Reference implementation of `merge_involvement` with the original row-wise `DataFrame.apply`.
+    """
+    for new_col, cols_to_merge in INVOLVEMENT_GROUPS.items():
+        df[new_col] = df.apply(lambda row: merge_columns_function(row, cols_to_merge), axis=1)
+    return df
+
+
+def benchmark_merge_involvement(raw):
+    rowwise = best_time(lambda: merge_involvement_rowwise(raw.copy()), repeat=3)
+    vectorized = best_time(lambda: merge_involvement(raw.copy()))
+    print(f"merge_involvement ({len(raw)} rows): row-wise {rowwise * 1000:.1f} ms, "
+          f"vectorized {vectorized * 1000:.1f} ms, {rowwise / vectorized:.0f}x faster")
+
+
+def encodings_chained_replace(df):
+    """
+    Reference implementation of the three encoding steps with the original chained `Series.replace` calls.
+    """
+    for spec in ENCODINGS.values():
+        for col in spec['columns']:
+            if col not in df.columns:
+                continue
+            encoded = df[col]
+            for category, value in spec['categories'].items():
+                encoded = encoded.replace(category, value)
+            df[col] = encoded
+    return df
+
+
+def encodings_compiled(df):
+    return encoding_aligned_no(encoding_colors(involvement_encoding(df)))
+
+
+def benchmark_encodings(raw):
+    merged = merge_involvement(raw.copy())
+
+    # a single company, as built by the /predict/data request path
+    row = merged.iloc[[np.flatnonzero(merged['sdg_No Poverty'].notna())[0]]].reset_index(drop=True)
+
+    for label, frame in [(f'{len(merged)} rows', merged), ('1 row', row)]:
+        chained = best_time(lambda: encodings_chained_replace(frame.copy()))
+        compiled = best_time(lambda: encodings_compiled(frame.copy()))
+        print(f"encodings ({label}): chained replace {chained * 1000:.2f} ms, "
+              f"compiled {compiled * 1000:.2f} ms, {chained / compiled:.1f}x faster")
+
+
+def merge_by_esg_per_metric(df):
+    """
+    Reference implementation of `merge_by_esg` with one weighted sum of Series per metric.
+    """
+    with open(METRIC_WEIGHTS_PATH) as f:
+        weights = json.load(f)
+    for metric_name, metric_weights in weights.items():
+        for col in metric_weights.keys():
+            if col not in df.columns:
+                raise ValueError(f"Colonna {col} non trovata nel DataFrame")
+        df[metric_name] = sum(df[col] * weight for col, weight in metric_weights.items())
+        df = df.drop(columns=list(metric_weights.keys()))
+    return df
+
+
+def benchmark_merge_by_esg(raw):
+    encoded = encodings_compiled(merge_involvement(raw.copy()))
+    _, columns, _, _ = load_metric_weights()
+    encoded[columns] = encoded[columns].apply(pd.to_numeric, errors='coerce')
+
+    per_metric = best_time(lambda: merge_by_esg_per_metric(encoded.copy()))
+    fused = best_time(lambda: merge_by_esg(encoded.copy()))
+    print(f"merge_by_esg ({len(encoded)} rows): per metric {per_metric * 1000:.2f} ms, "
+          f"fused {fused * 1000:.2f} ms, {per_metric / fused:.1f}x faster")
+
+
+if __name__ == '__main__':
+    raw_df = pd.read_csv(RAW_PATH, low_memory=False)
+    benchmark_merge_involvement(raw_df)
+    benchmark_encodings(raw_df)
+    benchmark_merge_by_esg(raw_df)
@@ -3,6 +3,36 @@ import pandas as pd
 
 pd.set_option('future.no_silent_downcasting', True)
 
+INVOLVEMENT_GROUPS = {
+    'Weapons involvement': [
+        'involvement_msci_Controversial Weapons',
+        'involvement_Controversial Weapons',
+        'involvement_Small Arms',
+        'involvement_Military Contracting'
+    ],
+    'Gambling involvement': [
+        'involvement_Gambling',
+        'involvement_msci_Gambling',
+        'involvement_Adult Entertainment'
+    ],
+    'Tobacco involvement': [
+        'involvement_msci_Tobacco Products',
+        'involvement_Tobacco Products'
+    ],
+    'Alcoholic involvement': [
+        'involvement_Alcoholic Beverages',
+        'involvement_msci_Alcoholic Beverages'
+    ],
+    'Environment involvement': [
+        'involvement_Pesticides',
+        'involvement_Thermal Coal',
+        'involvement_Palm Oil',
+        'involvement_GMO',
+        'involvement_Animal Testing',
+        'involvement_Fur and Specialty Leather'
+    ]
+}
+
 
 def flatten_dict(d, parent_key='', sep='_'):
     """
@@ -73,6 +103,37 @@ def merge_columns_function(row, columns):
     return np.nan
 
 
+def merge_columns(df, columns):
+    """
+    Column-wise equivalent of applying `merge_columns_function` to every row of the DataFrame.
+
+    The columns are checked in order and, as with the `KeyError` fallback of the row-wise version, only the
+    columns before the first missing one are considered: if a column is missing a row can still be 'Yes',
+    but never 'No'.
+
+    Parameters:
+    df (pd.DataFrame): The input DataFrame.
+    columns (list): A list of column names to merge.
+
+    Returns:
+    pd.Series: 'Yes' where any column has 'Yes', 'No' where any column has 'No', otherwise NaN.
+    """
+    present = []
+    for col in columns:
+        if col not in df.columns:
+            break
+        present.append(col)
+
+    values = df[present]
+    merged = np.full(len(df), np.nan, dtype=object)
+
+    if len(present) == len(columns):
+        merged[values.eq('No').any(axis=1).to_numpy()] = 'No'
+    merged[values.eq('Yes').any(axis=1).to_numpy()] = 'Yes'
+
+    return pd.Series(merged, index=df.index).infer_objects()
+
+
 def merge_involvement(df):
     """
     Merges involvement columns into new columns and drops the original columns.
@@ -83,38 +144,8 @@ def merge_involvement(df):
     Returns:
     pd.DataFrame: The DataFrame with merged involvement columns and original columns dropped.
     """
-    merge_columns = {
-        'Weapons involvement': [
-            'involvement_msci_Controversial Weapons',
-            'involvement_Controversial Weapons',
-            'involvement_Small Arms',
-            'involvement_Military Contracting'
-        ],
-        'Gambling involvement': [
-            'involvement_Gambling',
-            'involvement_msci_Gambling',
-            'involvement_Adult Entertainment'
-        ],
-        'Tobacco involvement': [
-            'involvement_msci_Tobacco Products',
-            'involvement_Tobacco Products'
-        ],
-        'Alcoholic involvement': [
-            'involvement_Alcoholic Beverages',
-            'involvement_msci_Alcoholic Beverages'
-        ],
-        'Environment involvement': [
-            'involvement_Pesticides',
-            'involvement_Thermal Coal',
-            'involvement_Palm Oil',
-            'involvement_GMO',
-            'involvement_Animal Testing',
-            'involvement_Fur and Specialty Leather'
-        ]
-    }
-
-    for new_col, cols_to_merge in merge_columns.items():
-        df[new_col] = df.apply(lambda row: merge_columns_function(row, cols_to_merge), axis=1)
+    for new_col, cols_to_merge in INVOLVEMENT_GROUPS.items():
+        df[new_col] = merge_columns(df, cols_to_merge)
 
     cols_to_drop = [
         'involvement_Alcoholic Beverages',
@@ -1,3 +1,192 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+ENCODINGS = {
+    'involvement': {
+        'columns': [
+            'Weapons involvement',
+            'Gambling involvement',
+            'Tobacco involvement',
+            'Alcoholic involvement',
+            'Environment involvement'
+        ],
+        'categories': {'Yes': 1.0, 'No': 0.01},
+        'required': True
+    },
+    'controversy_colors': {
+        'columns': [
+            'Controversies_Environment',
+            'Controversies_Social',
+            'Controversies_Customers',
+            'Controversies_Human Rights & Community',
+            'Controversies_Labor Rights & Supply Chain',
+            'Controversies_Governance'
+        ],
+        'categories': {'Green': 0.01, 'Yellow': 0.34, 'Orange': 0.67, 'Red': 1.0},
+        # companies without controversy assessment, left as they are
+        'expected': ['No'],
+        'required': False
+    },
+    'sdg_alignment': {
+        'columns': [
+            'sdg_No Poverty',
+            'sdg_No Hunger',
+            'sdg_Good Health and Well-Being',
+            'sdg_Quality Education',
+            'sdg_Gender Equality',
+            'sdg_Clean Water and Sanitation',
+            'sdg_Affordable and Clean Energy',
+            'sdg_Decent Work and Economic Growth',
+            'sdg_Industry, Innovation and Infrastructure',
+            'sdg_Reduced Inequalities',
+            'sdg_Sustainable Cities and Communities',
+            'sdg_Responsible Consumption and Production',
+            'sdg_Climate Action',
+            'sdg_Life under Water',
+            'sdg_Life on Land',
+            'sdg_Peace, Justice and Strong Institutions',
+            'sdg_Partnerships for the Goals'
+        ],
+        'categories': {'No': 1.0, 'Aligned': 0.5, 'Strongly Aligned': 0.01},
+        'required': True
+    }
+}
+
+
+def compile_encodings(encodings):
+    """
+    Compiles an encoding spec into category indexes and lookup arrays.
+
+    Parameters:
+    encodings (dict): Column group mapped to its 'columns', its 'categories' (category -> float), whether the
+                      columns are 'required' and optionally the 'expected' values that are not categories but
+                      are not reported either.
+
+    Returns:
+    dict: Column group mapped to a tuple (columns, required, codes, lookup array, expected values), where
+          `codes` maps each category to its position in the lookup array. The lookup array has one extra
+          trailing NaN, selected by the -1 code of values that are not a category.
+    """
+    compiled = {}
+    for group, spec in encodings.items():
+        codes = {category: code for code, category in enumerate(spec['categories'])}
+        lookup = np.append(np.array(list(spec['categories'].values()), dtype=float), np.nan)
+        compiled[group] = (spec['columns'], spec['required'], codes, lookup, set(spec.get('expected', [])))
+    return compiled
+
+
+_COMPILED_ENCODINGS = compile_encodings(ENCODINGS)
+
+# (column, value) pairs already reported as unknown, so that each one is printed once; the webapp encodes
+# arbitrary payloads, so only the most recent `MAX_REPORTED` pairs are remembered
+MAX_REPORTED = 1000
+_reported = OrderedDict()
+_reported_lock = threading.Lock()
+
+
+def _first_reports(column, values):
+    """
+    Returns the values not reported yet for the column, and remembers them.
+    """
+    new = []
+    with _reported_lock:
+        for value in values:
+            key = (column, value)
+            if key in _reported:
+                _reported.move_to_end(key)
+                continue
+            _reported[key] = None
+            new.append(value)
+        while len(_reported) > MAX_REPORTED:
+            _reported.popitem(last=False)
+    return new
+
+
+def _category_code(category_codes, value):
+    try:
+        return category_codes.get(value, -1)
+    except TypeError:
+        # unhashable values, e.g. a list sent to the API, are not categories
+        return -1
+
+
+def apply_encoding(df, group):
+    """
+    Encodes all the columns of a group of the encoding spec in one pass.
+
+    Missing values stay NaN. Values that are not a category of the group are left unchanged and reported the
+    first time they are seen, unless they are expected values of the group.
+
+    Parameters:
+    df (pd.DataFrame): The input DataFrame.
+    group (str): The column group of `ENCODINGS` to encode.
+
+    Returns:
+    pd.DataFrame: The DataFrame with encoded columns.
+
+    Raises:
+    KeyError: If a column of a required group is not found in the DataFrame.
+    """
+    columns, required, category_codes, lookup, expected = _COMPILED_ENCODINGS[group]
+    if required:
+        missing = [col for col in columns if col not in df.columns]
+        if missing:
+            raise KeyError(missing[0])
+    else:
+        columns = [col for col in columns if col in df.columns]
+    if not columns:
+        return df
+
+    values = df[columns].to_numpy(dtype=object)
+    try:
+        codes = np.fromiter((category_codes.get(value, -1) for value in values.ravel()),
+                            dtype=np.intp, count=values.size)
+    except TypeError:
+        codes = np.fromiter((_category_code(category_codes, value) for value in values.ravel()),
+                            dtype=np.intp, count=values.size)
+    codes = codes.reshape(values.shape)
+    encoded = lookup[codes]
+
+    unknown = (codes == -1) & ~pd.isna(values)
+    if unknown.any():
+        for j in np.flatnonzero(unknown.any(axis=0)):
+            seen = {str(value)[:100] for value in values[unknown[:, j], j]} - {str(value) for value in expected}
+            new = _first_reports(columns[j], sorted(seen))
+            if new:
+                print(f"Unknown {group} categories in column '{columns[j]}': {new}")
+        encoded = encoded.astype(object)
+        encoded[unknown] = values[unknown]
+
+    df[columns] = encoded
+    return df
+
+
+def unknown_categories(df, group):
+    """
+    Lists the values of a column group that are not categories of the encoding spec.
+
+    Parameters:
+    df (pd.DataFrame): The input DataFrame.
+    group (str): The column group of `ENCODINGS`.
+
+    Returns:
+    dict: Column name mapped to the set of unknown values, for the columns that have any.
+    """
+    columns, _, category_codes, _, _ = _COMPILED_ENCODINGS[group]
+    out = {}
+    for col in columns:
+        if col not in df.columns:
+            continue
+        values = df[col]
+        unknown = set(values[~values.isin(list(category_codes)) & values.notna()])
+        if unknown:
+            out[col] = unknown
+    return out
+
+
 def involvement_encoding(df):
     """
     Encodes involvement columns in the DataFrame by replacing 'Yes' with 1.0 and 'No' with 0.01.
@@ -8,18 +197,7 @@ def involvement_encoding(df):
     Returns:
     pd.DataFrame: The DataFrame with encoded involvement columns.
     """
-    cols = [
-        'Weapons involvement',
-        'Gambling involvement',
-        'Tobacco involvement',
-        'Alcoholic involvement',
-        'Environment involvement'
-    ]
-
-    for col in cols:
-        df[col] = df[col].replace('Yes', 1.0).replace('No', 0.01)
-
-    return df
+    return apply_encoding(df, 'involvement')
 
 
 def encoding_colors(df):
@@ -32,23 +210,7 @@ def encoding_colors(df):
     Returns:
     pd.DataFrame: The DataFrame with encoded controversy columns.
     """
-    cols = [
-        'Controversies_Environment',
-        'Controversies_Social',
-        'Controversies_Customers',
-        'Controversies_Human Rights & Community',
-        'Controversies_Labor Rights & Supply Chain',
-        'Controversies_Governance'
-    ]
-    for col in cols:
-        try:
-            df[col] = (df[col].replace('Green', 0.01)
-                       .replace('Yellow', 0.34)
-                       .replace('Orange', 0.67)
-                       .replace('Red', 1.0))
-        except KeyError:
-            pass
-    return df
+    return apply_encoding(df, 'controversy_colors')
 
 
 def encoding_aligned_no(df):
@@ -62,32 +224,7 @@ def encoding_aligned_no(df):
     Returns:
     pd.DataFrame: The DataFrame with encoded SDG alignment columns.
     """
-    cols = [
-        'sdg_No Poverty',
-        'sdg_No Hunger',
-        'sdg_Good Health and Well-Being',
-        'sdg_Quality Education',
-        'sdg_Gender Equality',
-        'sdg_Clean Water and Sanitation',
-        'sdg_Affordable and Clean Energy',
-        'sdg_Decent Work and Economic Growth',
-        'sdg_Industry, Innovation and Infrastructure',
-        'sdg_Reduced Inequalities',
-        'sdg_Sustainable Cities and Communities',
-        'sdg_Responsible Consumption and Production',
-        'sdg_Climate Action',
-        'sdg_Life under Water',
-        'sdg_Life on Land',
-        'sdg_Peace, Justice and Strong Institutions',
-        'sdg_Partnerships for the Goals'
-    ]
-
-    for col in cols:
-        df[col] = (df[col].replace('No', 1.0)
-                   .replace('Aligned', 0.5)
-                   .replace('Strongly Aligned', 0.01))
-
-    return df
+    return apply_encoding(df, 'sdg_alignment')
 
 
 def create_weighted_controversy_metric(df):
@@ -0,0 +1,145 @@
+"""
+Streaming export of the companies from MongoDB to a Parquet file.
+
+Only the fields used by the data preparation are requested. The documents are flattened in batches and written
+as Parquet row groups with the fixed schema of `export_schema.json`, so the memory stays flat as the collection
+grows and every export has the same columns and types. The string 'null' the scrapers store for a missing value
+is written as a real null.
+
+Usage:
+    Run this module from the data_preparation directory; it writes ../data/raw.parquet.
+"""
+
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from data_preparation.cleaning import flatten_dict
+
+EXPORT_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'export_schema.json')
+RAW_PARQUET_PATH = '../data/raw.parquet'
+BATCH_SIZE = 1000
+
+ARROW_TYPES = {'string': pa.string(), 'int64': pa.int64(), 'float64': pa.float64()}
+
+
+def load_export_schema(path=EXPORT_SCHEMA_PATH):
+    """
+    Loads the columns of the export and their types.
+
+    Parameters:
+    path (str, optional): Path of the JSON schema, mapping each flattened column to string, int64 or float64.
+        Defaults to `EXPORT_SCHEMA_PATH`.
+
+    Returns:
+    pa.Schema: The Arrow schema.
+    """
+    with open(path) as f:
+        columns = json.load(f)
+    return pa.schema([(column, ARROW_TYPES[type_name]) for column, type_name in columns.items()])
+
+
+def export_projection(schema):
+    """
+    Builds the MongoDB projection of the top-level fields of the schema columns.
+
+    Parameters:
+    schema (pa.Schema): The export schema.
+
+    Returns:
+    dict: The projection, without _id.
+    """
+    fields = set()
+    for column in schema.names:
+        for prefix in ('involvement_msci', 'involvement', 'Controversies', 'Decarbonization Target', 'sdg'):
+            if column.startswith(prefix + '_'):
+                fields.add(prefix)
+                break
+        else:
+            fields.add(column)
+    return {'_id': 0, **{field: 1 for field in sorted(fields)}}
+
+
+def _coerce(value, arrow_type):
+    if value is None or value == 'null':
+        return None
+    if arrow_type == pa.string():
+        return str(value)
+    try:
+        # numbers may still be stored as scraped, e.g. employees as '164,000'
+        value = float(str(value).replace(',', ''))
+        return int(value) if arrow_type == pa.int64() else value
+    except (TypeError, ValueError):
+        return None
+
+
+def _record_batch(documents, schema, ignored):
+    rows = [flatten_dict(document) for document in documents]
+    names = set(schema.names)
+    for row in rows:
+        ignored.update(row.keys() - names)
+    columns = [pa.array([_coerce(row.get(field.name), field.type) for row in rows], type=field.type)
+               for field in schema]
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def export_companies(cursor=None, path=RAW_PARQUET_PATH, schema_path=EXPORT_SCHEMA_PATH, batch_size=BATCH_SIZE):
+    """
+    Streams the companies with a ticker to a Parquet file, one row group per batch of documents.
+
+    Parameters:
+    cursor (iterable, optional): The documents to export. Defaults to the companies with a ticker, with the
+        projection of the schema.
+    path (str, optional): Path of the Parquet file. Defaults to `RAW_PARQUET_PATH`.
+    schema_path (str, optional): Path of the JSON schema. Defaults to `EXPORT_SCHEMA_PATH`.
+    batch_size (int, optional): Number of documents flattened and written at a time. Defaults to `BATCH_SIZE`.
+
+    Returns:
+    int: The number of exported companies.
+    """
+    schema = load_export_schema(schema_path)
+    if cursor is None:
+        from utils.connector import companies_with_ticker
+        cursor = companies_with_ticker(export_projection(schema)).batch_size(batch_size)
+
+    count = 0
+    ignored = set()
+    # written next to the target, then renamed, so that readers never see a partial file
+    temporary = f"{path}.tmp"
+    with pq.ParquetWriter(temporary, schema) as writer:
+        batch = []
+        for document in cursor:
+            batch.append(document)
+            if len(batch) == batch_size:
+                writer.write_batch(_record_batch(batch, schema, ignored))
+                count += len(batch)
+                batch = []
+        if batch:
+            writer.write_batch(_record_batch(batch, schema, ignored))
+            count += len(batch)
+    os.replace(temporary, path)
+
+    if ignored:
+        print(f"Columns not in the export schema, ignored: {sorted(ignored)}")
+    print(f"{count} companies exported to {path}")
+    return count
+
+
+def read_companies(path=RAW_PARQUET_PATH, columns=None):
+    """
+    Reads the exported companies with their types, nulls as NaN or <NA>.
+
+    Parameters:
+    path (str, optional): Path of the Parquet file. Defaults to `RAW_PARQUET_PATH`.
+    columns (list, optional): Columns to read. Defaults to all of them.
+
+    Returns:
+    pd.DataFrame: The companies.
+    """
+    return pd.read_parquet(path, columns=columns)
+
+
+if __name__ == '__main__':
+    export_companies()
@@ -1,48 +1,273 @@
+"""
+Feature selection for the company-data model.
+
+Every candidate subset of features is scored by fitting a RandomForestRegressor on a fixed train/test split.
+Instead of trying all the 2^n subsets, the subsets to score are chosen by one of the selection engines:
+
+    forward      greedy forward selection, adding the best feature at each step
+    backward     greedy backward elimination, removing the least useful feature at each step
+    beam         forward selection keeping the best `beam_width` subsets of each size
+    permutation  nested subsets of the features ranked by permutation importance
+    exhaustive   all the combinations of at least two features, only viable for few columns
+
+Subsets are scored in parallel on a process pool and every score is appended to a checkpoint file, so an
+interrupted run resumes without refitting the subsets it has already scored. The results are written with the
+same schema as before: n_features, features, r2, mae, mse.
+
+Usage:
+    python feature_selection.py --method forward
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+from itertools import combinations
+
 import pandas as pd
-from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
+from sklearn.inspection import permutation_importance
 from sklearn.metrics import r2_score, mean_absolute_error, mean_squared_error
-from itertools import combinations
+from sklearn.model_selection import train_test_split
+from utils.datasets import load_dataset
 
-if __name__ == '__main__':
+DATA_PATH = '../data/by_esg.csv'
+RESULTS_PATH = '../data/feature_selection_results.csv'
+CHECKPOINT_PATH = '../data/feature_selection_checkpoint.jsonl'
 
-    df = pd.read_csv('../data/by_esg.csv', low_memory=False)
-    X = df.drop(columns=['esg'])
-    y = df['esg']
+_split = None
+
+
+def make_model():
+    return RandomForestRegressor(n_estimators=100, random_state=42)
+
+
+def _init_worker(split):
+    global _split
+    _split = split
+
+
+def score_subset(features):
+    """
+    Fits the model on a subset of features and scores it on the test split.
+
+    Args:
+        features (tuple): The feature names.
+
+    Returns:
+        dict: The number of features, the features, and the R², MAE and MSE on the test split.
+    """
+    X_train, X_test, y_train, y_test = _split
+    model = make_model()
+    model.fit(X_train[list(features)], y_train)
+    y_pred = model.predict(X_test[list(features)])
+
+    return {
+        'n_features': len(features),
+        'features': features,
+        'r2': r2_score(y_test, y_pred),
+        'mae': mean_absolute_error(y_test, y_pred),
+        'mse': mean_squared_error(y_test, y_pred)
+    }
+
+
+class SubsetEvaluator:
+    """
+    Scores subsets of features on a process pool, caching every score in a checkpoint file.
+    """
+
+    def __init__(self, X, y, checkpoint_path=CHECKPOINT_PATH, workers=None):
+        self.columns = list(X.columns)
+        self.split = train_test_split(X, y, test_size=0.3, random_state=42)
+        self.checkpoint_path = checkpoint_path
+        self.workers = workers
+
+        # scores are only reused for the same data
+        digest = hashlib.sha256(pd.util.hash_pandas_object(pd.concat([X, y], axis=1)).values.tobytes())
+        self.data_hash = digest.hexdigest()[:16]
+
+        self.results = {}
+        self.scored = {}
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # last line of an interrupted run
+                        continue
+                    if record.pop('data_hash') == self.data_hash:
+                        record['features'] = tuple(record['features'])
+                        self.results[record['features']] = record
+            print(f"Resuming from {len(self.results)} scored subsets")
+
+        self._pool = None
+
+    def __enter__(self):
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                         initargs=(self.split,))
+        return self
 
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
+    def __exit__(self, *exc):
+        self._pool.shutdown(cancel_futures=True)
+        self._pool = None
 
-    results = []
+    def canonical(self, features):
+        """
+        Returns the features in column order, so that the same subset always has the same key.
+        """
+        selected = set(features)
+        return tuple(col for col in self.columns if col in selected)
 
-    for k in range(2, X.shape[1] + 1):
-        for combo in combinations(X.columns, k):
-            X_train_combo = X_train[list(combo)]
-            X_test_combo = X_test[list(combo)]
+    def evaluate(self, subsets):
+        """
+        Scores the subsets that have not been scored yet.
 
-            model.fit(X_train_combo, y_train)
-            y_pred = model.predict(X_test_combo)
+        Args:
+            subsets (list): Subsets of feature names.
 
-            r2 = r2_score(y_test, y_pred)
-            mae = mean_absolute_error(y_test, y_pred)
-            mse = mean_squared_error(y_test, y_pred)
+        Returns:
+            list: The result of each subset, in the same order.
+        """
+        keys = [self.canonical(subset) for subset in subsets]
+        self.scored.update(dict.fromkeys(keys))
+        pending = list(dict.fromkeys(key for key in keys if key not in self.results))
 
-            results.append({
-                'n_features': k,
-                'features': combo,
-                'r2': r2,
-                'mae': mae,
-                'mse': mse
-            })
+        if pending:
+            futures = [self._pool.submit(score_subset, key) for key in pending]
+            # without a checkpoint file the scores are only kept in memory
+            with open(self.checkpoint_path, 'a') if self.checkpoint_path else nullcontext() as f:
+                for future in as_completed(futures):
+                    result = future.result()
+                    self.results[result['features']] = result
+                    if f is not None:
+                        f.write(json.dumps({**result, 'data_hash': self.data_hash}) + '\n')
+                        f.flush()
+                    print(f"{result['n_features']} features - R²: {result['r2']:.4f} - {result['features']}")
 
-            print(f"Number of features: {k}")
-            print(f"Features: {combo}")
-            print(f"R²: {r2}")
-            print(f"MAE: {mae}")
-            print(f"MSE: {mse}")
-            print('-' * 40)
+        return [self.results[key] for key in keys]
+
+
+def forward_selection(evaluator, max_features=None):
+    """
+    Greedy forward selection: starting from the best single feature, adds the feature that gives the best R².
+    """
+    columns = evaluator.columns
+    max_features = max_features or len(columns)
+    selected = []
+
+    while len(selected) < max_features:
+        candidates = [selected + [col] for col in columns if col not in selected]
+        best = max(evaluator.evaluate(candidates), key=lambda r: r['r2'])
+        selected = list(best['features'])
+
+
+def backward_elimination(evaluator, min_features=2):
+    """
+    Greedy backward elimination: starting from all the features, removes the feature whose removal gives the
+    best R².
+    """
+    selected = list(evaluator.columns)
+    evaluator.evaluate([selected])
+
+    while len(selected) > min_features:
+        candidates = [[col for col in selected if col != removed] for removed in selected]
+        best = max(evaluator.evaluate(candidates), key=lambda r: r['r2'])
+        selected = list(best['features'])
+
+
+def beam_search(evaluator, beam_width=3, max_features=None):
+    """
+    Forward selection that keeps the `beam_width` best subsets of each size instead of only the best one.
+    """
+    columns = evaluator.columns
+    max_features = max_features or len(columns)
+    beam = [()]
+
+    for _ in range(max_features):
+        candidates = {evaluator.canonical(subset + (col,)) for subset in beam for col in columns if col not in subset}
+        if not candidates:
+            break
+        results = sorted(evaluator.evaluate(sorted(candidates)), key=lambda r: r['r2'], reverse=True)
+        beam = [r['features'] for r in results[:beam_width]]
+
+
+def permutation_ranking(evaluator, min_features=2):
+    """
+    Ranks the features by permutation importance of a model fitted on all of them, then scores the nested
+    subsets made of the top k features.
+    """
+    X_train, X_test, y_train, y_test = evaluator.split
+    model = make_model().fit(X_train, y_train)
+    importance = permutation_importance(model, X_test, y_test, n_repeats=10, random_state=42,
+                                        n_jobs=evaluator.workers)
+    ranking = [evaluator.columns[i] for i in importance.importances_mean.argsort()[::-1]]
+
+    for col, mean in zip(ranking, sorted(importance.importances_mean, reverse=True)):
+        print(f"{col}: {mean:.4f}")
+
+    evaluator.evaluate([ranking[:k] for k in range(min_features, len(ranking) + 1)])
+
+
+def exhaustive_search(evaluator, min_features=2):
+    """
+    Scores all the combinations of at least `min_features` features.
+    """
+    columns = evaluator.columns
+    for k in range(min_features, len(columns) + 1):
+        evaluator.evaluate(list(combinations(columns, k)))
+
+
+METHODS = {
+    'forward': forward_selection,
+    'backward': backward_elimination,
+    'beam': beam_search,
+    'permutation': permutation_ranking,
+    'exhaustive': exhaustive_search,
+}
+
+
+def select_features(X, y, method='forward', checkpoint_path=CHECKPOINT_PATH, workers=None, **kwargs):
+    """
+    Runs a selection engine and returns every subset it scored.
+
+    Args:
+        X (pd.DataFrame): The candidate features.
+        y (pd.Series): The target.
+        method (str, optional): One of `METHODS`. Defaults to 'forward'.
+        checkpoint_path (str, optional): File where the scores are cached. Defaults to `CHECKPOINT_PATH`.
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        **kwargs: Passed to the selection engine, e.g. `beam_width`.
+
+    Returns:
+        pd.DataFrame: One row per scored subset with columns n_features, features, r2, mae, mse.
+    """
+    with SubsetEvaluator(X, y, checkpoint_path=checkpoint_path, workers=workers) as evaluator:
+        METHODS[method](evaluator, **kwargs)
+        results = [evaluator.results[key] for key in evaluator.scored]
+
+    return (pd.DataFrame(results, columns=['n_features', 'features', 'r2', 'mae', 'mse'])
+            .sort_values(['n_features', 'r2'], ascending=[True, False], ignore_index=True))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Select the features of the company-data model.')
+    parser.add_argument('--method', choices=list(METHODS), default='forward')
+    parser.add_argument('--beam-width', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH)
+    parser.add_argument('--output', default=RESULTS_PATH)
+    args = parser.parse_args()
+
+    df = load_dataset(DATA_PATH)
+    X = df.drop(columns=['esg'])
+    y = df['esg']
 
-    results_df = pd.DataFrame(results)
+    options = {'beam_width': args.beam_width} if args.method == 'beam' else {}
+    results_df = select_features(X, y, method=args.method, checkpoint_path=args.checkpoint,
+                                 workers=args.workers, **options)
     print(results_df)
 
-    results_df.to_csv('../data/feature_selection_results.csv', index=False)
+    results_df.to_csv(args.output, index=False)
@@ -0,0 +1,82 @@
+"""
+ESG metrics of the companies: the weighted sums of the encoded controversy, SDG and involvement columns.
+
+The weights of each metric are in `metric_weights.json`, next to this module.
+"""
+
+import json
+import os
+
+import numpy as np
+
+METRIC_WEIGHTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'metric_weights.json')
+
+_metric_weights_cache = {}
+
+
+def load_metric_weights(path=METRIC_WEIGHTS_PATH):
+    """
+    Loads the weights of the ESG metrics as a single weight matrix.
+
+    The file maps each metric name to the weight of each of its source columns. It is re-read only when its
+    modification time changes.
+
+    Parameters:
+    path (str, optional): Path of the JSON weights file. Defaults to `METRIC_WEIGHTS_PATH`.
+
+    Returns:
+    tuple: The metric names, the source columns, the (columns x metrics) weight matrix and the boolean
+    (columns x metrics) matrix of the columns listed for each metric, whatever their weight.
+    """
+    mtime = os.path.getmtime(path)
+    cached = _metric_weights_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with open(path) as f:
+        weights = json.load(f)
+
+    metrics = list(weights)
+    columns = list(dict.fromkeys(col for metric in metrics for col in weights[metric]))
+    matrix = np.zeros((len(columns), len(metrics)))
+    listed = np.zeros((len(columns), len(metrics)), dtype=bool)
+    for j, metric in enumerate(metrics):
+        for col, weight in weights[metric].items():
+            matrix[columns.index(col), j] = weight
+            listed[columns.index(col), j] = True
+
+    _metric_weights_cache[path] = (mtime, (metrics, columns, matrix, listed))
+    return metrics, columns, matrix, listed
+
+
+def merge_by_esg(df, weights_path=METRIC_WEIGHTS_PATH):
+    """
+    Replaces the controversy, SDG and involvement columns with the weighted environmental, social, governance
+    and involvement metrics, computed together with a single matrix product.
+
+    Parameters:
+    df (pd.DataFrame): The input DataFrame containing the encoded columns.
+    weights_path (str, optional): Path of the JSON weights file. Defaults to `METRIC_WEIGHTS_PATH`.
+
+    Returns:
+    pd.DataFrame: The DataFrame with the metric columns and without their source columns.
+
+    Raises:
+    ValueError: If any source column is not found in the DataFrame.
+    """
+    metrics, columns, matrix, listed = load_metric_weights(weights_path)
+    for col in columns:
+        if col not in df.columns:
+            raise ValueError(f"Colonna {col} non trovata nel DataFrame")
+
+    values = df[columns].to_numpy(dtype=float)
+    missing = np.isnan(values)
+
+    # a metric is NaN if one of its own source columns is NaN, even a column of weight 0, like the weighted
+    # sum of the columns it replaces
+    result = np.where(missing, 0.0, values) @ matrix
+    result[missing @ listed] = np.nan
+
+    df = df.drop(columns=columns)
+    df[metrics] = result
+    return df
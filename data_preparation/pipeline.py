@@ -0,0 +1,216 @@
+"""
+Incremental data preparation of the companies, as named stages.
+
+The stages of `clean_with_metrics` are of two kinds:
+
+    row stages only look at each company on its own: dropping the rows without ESG score or ticker, cleaning,
+    merging and encoding the columns
+    table stages need the whole table: dropping the sparse columns and then the incomplete rows, computing the
+    ESG metrics
+
+The output of the row stages is cached per company, addressed by a fingerprint of the company's exported row.
+A refresh only runs the row stages on the new or changed companies, merges them with the cached rows of the
+others and runs the table stages on the merged table. The cache is keyed by a hash of the stage code as well,
+so changing a stage rebuilds it.
+
+Usage:
+    Run this module from the data_preparation directory; it reads ../data/raw.parquet, see `export`.
+"""
+
+import hashlib
+import inspect
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from data_preparation import cleaning, encoding
+from data_preparation.cleaning import clean_decarbonization_target, merge_involvement
+from data_preparation.encoding import encoding_aligned_no, encoding_colors, involvement_encoding
+from data_preparation.export import read_companies
+from data_preparation.metrics import merge_by_esg
+
+CACHE_DIR = '../data/.cache/pipeline'
+SPARSE_THRESHOLD = 500
+
+Stage = namedtuple('Stage', ['name', 'func'])
+
+
+def drop_identifiers(df):
+    return (df.drop(columns=['_id', 'domain', 'name', 'sector', 'industry'], errors='ignore')
+            .replace('null', np.nan))
+
+
+def require_esg_and_ticker(df):
+    return df.dropna(subset=['esg']).dropna(subset=['ticker'])
+
+
+def employees_to_int(df):
+    df['employees'] = df['employees'].astype('Int64')
+    return df
+
+
+def drop_constant_columns(df):
+    return df.drop(columns=['Decarbonization Target_Decarbonization Target',
+                            'Decarbonization Target_Decarbonization Target on Temperature Rise'])
+
+
+def drop_sparse_columns(df):
+    return df.dropna(thresh=SPARSE_THRESHOLD, axis=1)
+
+
+def drop_incomplete_rows(df):
+    return df.dropna()
+
+
+ROW_STAGES = [
+    Stage('drop_identifiers', drop_identifiers),
+    Stage('require_esg_and_ticker', require_esg_and_ticker),
+    Stage('clean_decarbonization_target', clean_decarbonization_target),
+    Stage('employees_to_int', employees_to_int),
+    Stage('merge_involvement', merge_involvement),
+    Stage('involvement_encoding', involvement_encoding),
+    Stage('encoding_colors', encoding_colors),
+    Stage('drop_constant_columns', drop_constant_columns),
+    Stage('encoding_aligned_no', encoding_aligned_no),
+]
+
+TABLE_STAGES = [
+    Stage('drop_sparse_columns', drop_sparse_columns),
+    Stage('drop_incomplete_rows', drop_incomplete_rows),
+    Stage('merge_by_esg', merge_by_esg),
+]
+
+
+def apply_stages(df, stages, verbose=False):
+    """
+    Runs the stages in order.
+
+    Parameters:
+    df (pd.DataFrame): The input DataFrame.
+    stages (list): The stages.
+    verbose (bool, optional): If True, prints the number of rows and the time of each stage. Defaults to False.
+
+    Returns:
+    pd.DataFrame: The output of the last stage.
+    """
+    for stage in stages:
+        start = time.perf_counter()
+        df = stage.func(df)
+        if verbose:
+            print(f"{stage.name}: {len(df)} rows, {time.perf_counter() - start:.3f}s")
+    return df
+
+
+def stages_version():
+    """
+    Hashes the code of the row stages, so that the cached rows are rebuilt when a stage changes.
+
+    Returns:
+    str: The hexadecimal digest.
+    """
+    digest = hashlib.sha256()
+    for module in (cleaning, encoding, inspect.getmodule(stages_version)):
+        digest.update(inspect.getsource(module).encode())
+    digest.update(' '.join(stage.name for stage in ROW_STAGES).encode())
+    return digest.hexdigest()[:16]
+
+
+def row_fingerprints(raw):
+    """
+    Fingerprints every company by the content of its exported row.
+
+    Parameters:
+    raw (pd.DataFrame): The exported companies.
+
+    Returns:
+    pd.Series: One fingerprint per row, equal for equal rows.
+    """
+    return pd.util.hash_pandas_object(raw, index=False)
+
+
+def _cache_path(cache_dir, version):
+    return os.path.join(cache_dir, f"rows-{version}.pkl")
+
+
+def load_row_cache(cache_dir=CACHE_DIR, version=None):
+    """
+    Loads the cached output of the row stages.
+
+    Returns:
+    pd.DataFrame: The rows indexed by fingerprint, with a `_kept` column False for the rows the row stages
+    dropped, or None if there is no cache for the current stages.
+    """
+    path = _cache_path(cache_dir, version or stages_version())
+    if not os.path.exists(path):
+        return None
+    return pd.read_pickle(path)
+
+
+def save_row_cache(rows, cache_dir=CACHE_DIR, version=None):
+    version = version or stages_version()
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _cache_path(cache_dir, version)
+    temporary = f"{path}.tmp"
+    rows.to_pickle(temporary)
+    os.replace(temporary, path)
+
+    # the rows of older stage versions can no longer be used
+    for name in os.listdir(cache_dir):
+        if name.startswith('rows-') and name.endswith('.pkl') and name != os.path.basename(path):
+            os.remove(os.path.join(cache_dir, name))
+
+
+def run_pipeline(raw=None, cache_dir=CACHE_DIR, verbose=True):
+    """
+    Prepares the companies like `clean_with_metrics`, running the row stages only on new or changed companies.
+
+    Parameters:
+    raw (pd.DataFrame, optional): The exported companies. Defaults to the Parquet export.
+    cache_dir (str, optional): Directory of the cached rows, or None to disable the cache. Defaults to `CACHE_DIR`.
+    verbose (bool, optional): If True, prints the number of processed rows and the time of each stage.
+        Defaults to True.
+
+    Returns:
+    pd.DataFrame: The same table as `clean_with_metrics`.
+    """
+    if raw is None:
+        raw = read_companies()
+    raw = raw.reset_index(drop=True)
+    version = stages_version()
+
+    fingerprints = row_fingerprints(raw)
+    cached = load_row_cache(cache_dir, version) if cache_dir is not None else None
+    removed = 0
+    if cached is not None:
+        current = cached.index.isin(fingerprints)
+        removed = int((~current).sum())
+        cached = cached[current]
+
+    todo = ~fingerprints.isin(cached.index) if cached is not None else pd.Series(True, index=raw.index)
+    todo &= ~fingerprints.duplicated()
+    if verbose:
+        print(f"{int(todo.sum())} of {len(raw)} companies to prepare")
+
+    new = raw[todo.to_numpy()].copy()
+    processed = apply_stages(new, ROW_STAGES, verbose=verbose) if len(new) else new.iloc[:, :0]
+    processed['_kept'] = True
+    processed.index = fingerprints[processed.index].to_numpy()
+    dropped = pd.DataFrame({'_kept': False}, index=fingerprints[todo].to_numpy()).drop(processed.index)
+
+    parts = [part for part in (cached, processed, dropped) if part is not None and len(part)]
+    rows = pd.concat(parts) if parts else processed
+    if cache_dir is not None and (todo.any() or removed):
+        save_row_cache(rows, cache_dir, version)
+
+    # back to the order and index of the export, without the rows dropped by the row stages
+    df = rows.reindex(fingerprints.to_numpy())
+    df.index = raw.index
+    df = df[df['_kept'].astype(bool)].drop(columns='_kept')
+
+    return apply_stages(df, TABLE_STAGES, verbose=verbose)
+
+
+if __name__ == '__main__':
+    run_pipeline()
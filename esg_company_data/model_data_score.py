@@ -1,15 +1,15 @@
 import joblib
 from sklearn.ensemble import RandomForestRegressor
-import pandas as pd
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from sklearn.model_selection import KFold
 from data_preparation.balancing import balancing_kmeans
+from utils.datasets import load_dataset
 
 path = 'saved/data_score.pkl'
 
 
 def train_save_model(path):
-    df = pd.read_csv('../data/label_with_metrics.csv').drop(columns=['ticker', 'name'])
+    df = load_dataset('../data/label_with_metrics.csv').drop(columns=['ticker', 'name'])
     X, y = balancing_kmeans(df, n_cluster=10)
 
     print(X.columns)
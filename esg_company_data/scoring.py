@@ -0,0 +1,139 @@
+import argparse
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from data_preparation.cleaning import flatten_dict, clean_decarbonization_target, merge_involvement
+from data_preparation.encoding import ENCODINGS, involvement_encoding, encoding_colors, encoding_aligned_no
+from data_preparation.metrics import METRIC_WEIGHTS_PATH, merge_by_esg
+from utils.prediction_cache import cache_key
+
+COLUMN_MAPPINGS = {
+    'Decarbonization_Target_target_year': 'Decarbonization_Target_target_year',
+    'Decarbonization_Target_comprehensiveness': 'Decarbonization_Target_Comprehensiveness',
+    'Decarbonization_Target_ambition_per_annum': 'Decarbonization_Target_Ambition p.a.',
+    'Decarbonization_Target_temperature_goal': 'Temperature Goal',
+}
+
+FEATURE_ORDER = ['employees', 'altman_score', 'piotroski_score',
+                 'Decarbonization Target_Target Year',
+                 'Decarbonization Target_Comprehensiveness',
+                 'Decarbonization Target_Ambition p.a.', 'Temperature Goal',
+                 'environmental_metric', 'social_metric', 'governance_metric',
+                 'involvement_metric']
+
+
+def preprocessing_version():
+    """
+    Identifies the preprocessing of the payloads, for the keys of cached predictions: the metric weights, which
+    are reloaded when their file changes, and the encoding spec.
+
+    Returns:
+        str: A digest that changes with the weights file or the encoding spec.
+    """
+    return cache_key(os.stat(METRIC_WEIGHTS_PATH).st_mtime_ns, ENCODINGS)
+
+
+def _prepare_frame(df):
+    df = df.rename(columns=COLUMN_MAPPINGS)
+
+    df = clean_decarbonization_target(df)
+    df = merge_involvement(df)
+    df = involvement_encoding(df)
+    df = encoding_colors(df)
+    df = encoding_aligned_no(df)
+    df = merge_by_esg(df)
+
+    return df.reindex(columns=FEATURE_ORDER)
+
+
+def prepare_features(payloads):
+    """
+    Runs the preprocessing pipeline of the company-data model over many company payloads at once.
+
+    Payloads with the same fields, each with the same type of value, go through the pipeline together, so
+    every column of a group has the dtype it would have for a single company and every company gets exactly
+    the features it would get on its own, while the pandas overhead is paid once per group instead of once
+    per company.
+
+    Args:
+        payloads (list): Company payloads, nested as sent to /predict/data or already flattened.
+
+    Returns:
+        pd.DataFrame: One row of model features per payload, in the same order, with columns `FEATURE_ORDER`.
+    """
+    flattened = [flatten_dict(payload) for payload in payloads]
+
+    groups = {}
+    for i, record in enumerate(flattened):
+        groups.setdefault(tuple((key, type(value)) for key, value in record.items()), []).append(i)
+
+    frames = []
+    for keys, positions in groups.items():
+        df = pd.DataFrame({key: [flattened[i][key] for i in positions] for key, _ in keys}, index=positions)
+        frames.append(_prepare_frame(df))
+
+    return pd.concat(frames).sort_index() if frames else pd.DataFrame(columns=FEATURE_ORDER)
+
+
+def predict_payloads(model, payloads):
+    """
+    Predicts the ESG score of many companies with a single call to the model.
+
+    Args:
+        model: The fitted company-data model.
+        payloads (list): Company payloads, nested as sent to /predict/data or already flattened.
+
+    Returns:
+        np.ndarray: The predicted ESG scores rounded to two decimal places.
+    """
+    # nullable integer columns hold pd.NA, which the model does not take
+    X = prepare_features(payloads).to_numpy(dtype=float, na_value=np.nan)
+    if len(X) == 0:
+        return np.array([])
+    return np.round(model.predict(X), 2)
+
+
+def read_table(path):
+    if os.path.splitext(path)[1] == '.parquet':
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def write_table(df, path):
+    if os.path.splitext(path)[1] == '.parquet':
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def score_file(model_path, input_path, output_path):
+    """
+    Scores every company of a CSV or Parquet file and writes the input rows with an `esg_prediction` column.
+
+    Args:
+        model_path (str): Path of the saved company-data model.
+        input_path (str): CSV or Parquet file with one flattened company payload per row.
+        output_path (str): CSV or Parquet file to write.
+    """
+    model = joblib.load(model_path)
+    df = read_table(input_path)
+
+    # missing values are left out of the payload, as they are when a field is not sent to /predict/data
+    payloads = [{key: value for key, value in record.items() if not pd.isna(value)}
+                for record in df.to_dict(orient='records')]
+
+    df['esg_prediction'] = predict_payloads(model, payloads)
+    write_table(df, output_path)
+    print(f"Scored {len(df)} companies into {output_path}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Score a file of companies with the company-data model.')
+    parser.add_argument('input', help='CSV or Parquet file with one flattened company payload per row')
+    parser.add_argument('output', help='CSV or Parquet file to write the predictions to')
+    parser.add_argument('--model', default='saved/data_score.pkl', help='path of the saved model')
+    args = parser.parse_args()
+
+    score_file(args.model, args.input, args.output)
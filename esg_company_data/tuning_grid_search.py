@@ -1,40 +1,229 @@
-from sklearn.model_selection import KFold, GridSearchCV
-from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import StandardScaler, RobustScaler, MinMaxScaler
-from sklearn.ensemble import RandomForestRegressor
+"""
+Hyperparameter search for the company-data model.
 
+The (scaler, RandomForestRegressor) pipeline can be tuned with an exhaustive grid search, a randomized search
+over the same grid, or successive halving, which scores every candidate on a small sample and only keeps the
+best third of them for the next, three times larger, sample.
 
-def tune_random_forest_params(X, y):
-    # Define the parameter grid for the saved
-    param_grid = {
-        'scaler': [StandardScaler(), RobustScaler(), MinMaxScaler()],
-        'model__n_estimators': [50, 100, 200, 300],
-        'model__max_features': ['sqrt', 'log2'],
-        'model__max_depth': [5, 10, 20, 30],
-        'model__min_samples_split': [2, 5, 10],
-        'model__min_samples_leaf': [1, 2, 4]
-    }
+The score of every (candidate, fold, data sample) is appended to a cache file, so a rerun, or a different
+search over the same grid, skips the configurations that are already scored. The best pipeline can be refitted
+on the whole dataset and saved next to the production model under a new, timestamped name, which the webapp
+picks up as the newest `data_score*.pkl`.
 
-    # Initialize the saved
-    model = RandomForestRegressor(random_state=42)
+Usage:
+    python tuning_grid_search.py --method halving
+"""
 
-    # Define the number of folds
-    k_folds = 10
+import argparse
+import hashlib
+import json
+import math
+import os
+import time
 
-    # Split the dataset using K-fold cross-validation
-    kf = KFold(n_splits=k_folds, shuffle=True, random_state=42)
+import joblib
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.model_selection import KFold, ParameterGrid, ParameterSampler
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler, RobustScaler, MinMaxScaler
+from data_preparation.balancing import balancing_kmeans
+from utils.datasets import load_dataset
 
-    # Define the pipeline with scaler and saved
-    pipeline = Pipeline([
+CACHE_PATH = 'saved/tuning_scores.jsonl'
+# a new file on every export, so that tuning never overwrites the model being served
+EXPORT_PATH = 'saved/data_score-{timestamp}.pkl'
+
+PARAM_GRID = {
+    'scaler': [StandardScaler(), RobustScaler(), MinMaxScaler()],
+    'model__n_estimators': [50, 100, 200, 300],
+    'model__max_features': ['sqrt', 'log2'],
+    'model__max_depth': [5, 10, 20, 30],
+    'model__min_samples_split': [2, 5, 10],
+    'model__min_samples_leaf': [1, 2, 4]
+}
+
+
+def make_pipeline():
+    return Pipeline([
         ('scaler', StandardScaler()),
-        ('saved', model)
+        ('model', RandomForestRegressor(random_state=42))
     ])
 
-    # Perform grid search with cross-validation for the pipeline
-    grid_search = GridSearchCV(estimator=pipeline, param_grid=param_grid, cv=kf, n_jobs=-1)
-    grid_search.fit(X, y)
 
-    # Get the best parameters
-    best_params = grid_search.best_params_
+def params_key(params):
+    """
+    Returns a stable string identifying a configuration of the pipeline.
+    """
+    return ';'.join(f"{name}={value!r}" for name, value in sorted(params.items()))
+
+
+def data_key(X, y):
+    """
+    Returns a digest of the data a score was computed on.
+    """
+    digest = hashlib.sha256(pd.util.hash_pandas_object(pd.concat([X, y], axis=1)).values.tobytes())
+    return digest.hexdigest()[:16]
+
+
+def make_candidate(params):
+    # the scalers of `PARAM_GRID` are shared by all the candidates, so each pipeline gets its own copies
+    return clone(make_pipeline().set_params(**params))
+
+
+def _fit_and_score(params, X, y, train_index, test_index):
+    pipeline = make_candidate(params)
+    pipeline.fit(X.iloc[train_index], y.iloc[train_index])
+    return pipeline.score(X.iloc[test_index], y.iloc[test_index])
+
+
+class FoldScoreCache:
+    """
+    Append-only file of the R² of each (configuration, fold, data digest).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.scores = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.scores[(record['params'], record['fold'], record['data'])] = record['score']
+
+    def get(self, key):
+        return self.scores.get(key)
+
+    def add(self, key, score):
+        self.scores[key] = score
+        if self.path:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a') as f:
+                params, fold, data = key
+                f.write(json.dumps({'params': params, 'fold': fold, 'data': data, 'score': score}) + '\n')
+
+
+def cross_validate_candidates(candidates, X, y, cv, cache, n_jobs=-1):
+    """
+    Computes the mean cross-validated R² of each candidate, fitting only the folds that are not cached.
+
+    Args:
+        candidates (list): Parameter dictionaries of the pipeline.
+        X (pd.DataFrame): The features.
+        y (pd.Series): The target.
+        cv (KFold): The cross-validation splitter.
+        cache (FoldScoreCache): The fold-level score cache.
+        n_jobs (int, optional): Number of parallel jobs. Defaults to all the CPUs.
+
+    Returns:
+        list: The mean R² of each candidate.
+    """
+    folds = list(cv.split(X))
+    data = data_key(X, y)
+    keys = [[(params_key(params), i, data) for i in range(len(folds))] for params in candidates]
+
+    pending = [(params, key, folds[key[1]]) for params, candidate_keys in zip(candidates, keys)
+               for key in candidate_keys if cache.get(key) is None]
+    if pending:
+        print(f"Fitting {len(pending)} folds ({sum(len(k) for k in keys) - len(pending)} cached)")
+        scores = Parallel(n_jobs=n_jobs)(delayed(_fit_and_score)(params, X, y, train_index, test_index)
+                                         for params, _, (train_index, test_index) in pending)
+        for (_, key, _), score in zip(pending, scores):
+            cache.add(key, float(score))
+
+    return [float(np.mean([cache.get(key) for key in candidate_keys])) for candidate_keys in keys]
+
+
+def successive_halving(candidates, X, y, cv, cache, factor=3, min_samples=None, n_jobs=-1):
+    """
+    Successive halving: scores all the candidates on a small sample, keeps the best `1 / factor` of them and
+    repeats on a `factor` times larger sample until one candidate is left or the whole dataset is used.
+
+    Returns:
+        tuple: The best candidate and its mean R² on the last sample.
+    """
+    order = np.random.RandomState(42).permutation(len(X))
+    n_rounds = max(1, math.ceil(math.log(len(candidates), factor)))
+    n_samples = min_samples or max(cv.get_n_splits() * 10, len(X) // factor ** (n_rounds - 1))
+
+    while True:
+        n_samples = min(n_samples, len(X))
+        sample = order[:n_samples]
+        scores = cross_validate_candidates(candidates, X.iloc[sample], y.iloc[sample], cv, cache, n_jobs=n_jobs)
+        ranked = sorted(zip(scores, range(len(candidates))), reverse=True)
+        print(f"{len(candidates)} candidates on {n_samples} samples - best R²: {ranked[0][0]:.4f}")
+
+        if len(candidates) == 1 or n_samples == len(X):
+            return candidates[ranked[0][1]], ranked[0][0]
+
+        candidates = [candidates[i] for _, i in ranked[:math.ceil(len(candidates) / factor)]]
+        n_samples *= factor
+
+
+def tune_random_forest_params(X, y, method='grid', n_iter=50, cache_path=CACHE_PATH, export_path=None,
+                              n_jobs=-1):
+    """
+    Searches the hyperparameters of the (scaler, RandomForestRegressor) pipeline with 10-fold cross-validation.
+
+    Args:
+        X (pd.DataFrame): The features.
+        y (pd.Series): The target.
+        method (str, optional): 'grid', 'random' or 'halving'. Defaults to 'grid'.
+        n_iter (int, optional): Number of configurations sampled by the randomized search. Defaults to 50.
+        cache_path (str, optional): File where the fold scores are cached. Defaults to `CACHE_PATH`.
+        export_path (str, optional): If given, the best pipeline is refitted on all the data and saved there;
+            a `{timestamp}` field is replaced by the current time, e.g. 'saved/data_score-{timestamp}.pkl'.
+        n_jobs (int, optional): Number of parallel jobs. Defaults to all the CPUs.
+
+    Returns:
+        dict: The best parameters.
+    """
+    kf = KFold(n_splits=10, shuffle=True, random_state=42)
+    cache = FoldScoreCache(cache_path)
+
+    if method == 'random':
+        candidates = list(ParameterSampler(PARAM_GRID, n_iter=n_iter, random_state=42))
+    else:
+        candidates = list(ParameterGrid(PARAM_GRID))
+
+    if method == 'halving':
+        best_params, best_score = successive_halving(candidates, X, y, kf, cache, n_jobs=n_jobs)
+    else:
+        scores = cross_validate_candidates(candidates, X, y, kf, cache, n_jobs=n_jobs)
+        best_score, best_index = max(zip(scores, range(len(candidates))))
+        best_params = candidates[best_index]
+
+    print(f"Best R²: {best_score:.4f} - {params_key(best_params)}")
+
+    if export_path:
+        pipeline = make_candidate(best_params)
+        export_path = export_path.format(timestamp=time.strftime('%Y%m%d-%H%M%S'))
+        # the webapp predicts from plain arrays in the same column order
+        pipeline.fit(X.values, y.values)
+        os.makedirs(os.path.dirname(export_path) or '.', exist_ok=True)
+        joblib.dump(pipeline, export_path)
+        print(f"Best pipeline saved to {export_path}")
 
     return best_params
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Tune the hyperparameters of the company-data model.')
+    parser.add_argument('--method', choices=['grid', 'random', 'halving'], default='halving')
+    parser.add_argument('--n-iter', type=int, default=50)
+    parser.add_argument('--cache', default=CACHE_PATH)
+    parser.add_argument('--export', default=EXPORT_PATH)
+    args = parser.parse_args()
+
+    df = load_dataset('../data/label_with_metrics.csv').drop(columns=['ticker', 'name'])
+    # the same seed gives the same balanced set on every run, so the cached fold scores are reused
+    X, y = balancing_kmeans(df, n_cluster=10, random_state=42)
+
+    tune_random_forest_params(X, y, method=args.method, n_iter=args.n_iter, cache_path=args.cache,
+                              export_path=args.export)
@@ -0,0 +1,59 @@
+"""
+Parity check and timing of the array-backed SVN feature extraction against the networkx one.
+
+Usage:
+    Run this module from the esg_service_value_network directory; it reads ../data/label_with_metrics.csv
+    and ../data/filtered_links.csv.
+"""
+
+import timeit
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+from esg_service_value_network.csr_graph import CSRGraph, FEATURE_COLUMNS
+from esg_service_value_network.features import extract_features
+
+COMPANIES_PATH = '../data/label_with_metrics.csv'
+LINKS_PATH = '../data/filtered_links.csv'
+
+
+def networkx_features(companies, links):
+    """
+    Reference implementation: the graph of `create_graph` and one `extract_features` call per company.
+    """
+    G = nx.Graph()
+    for name, esg in zip(companies['name'], companies['esg']):
+        G.add_node(name, esg=esg)
+    for home, link, rel_type in zip(links['home_name'], links['link_name'], links['type']):
+        if home in G and link in G:
+            G.add_edge(home, link, relationship=rel_type)
+    return pd.DataFrame([extract_features(G, name) for name in G], index=list(G))
+
+
+def benchmark_features(companies, links):
+    expected = networkx_features(companies, links)[FEATURE_COLUMNS]
+    actual = CSRGraph.from_frames(companies, links).features_frame().set_index('name')[FEATURE_COLUMNS]
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False, check_names=False, rtol=1e-12)
+
+    reference = min(timeit.repeat(lambda: networkx_features(companies, links), number=1, repeat=3))
+    csr = min(timeit.repeat(lambda: CSRGraph.from_frames(companies, links).feature_matrix(), number=1, repeat=5))
+    print(f"SVN features ({len(companies)} companies, {len(links)} links): networkx {reference * 1000:.1f} ms, "
+          f"CSR {csr * 1000:.1f} ms, {reference / csr:.0f}x faster")
+
+
+def synthetic_graph(n_companies, n_links, seed=42):
+    rng = np.random.default_rng(seed)
+    names = np.arange(n_companies).astype(str)
+    companies = pd.DataFrame({'name': names, 'esg': rng.uniform(0, 50, n_companies)})
+    links = pd.DataFrame({
+        'home_name': names[rng.integers(0, n_companies, n_links)],
+        'link_name': names[rng.integers(0, n_companies, n_links)],
+        'type': rng.choice(['partnership', 'customer', 'supplier', 'investment', 'competitor'], n_links),
+    })
+    return companies, links
+
+
+if __name__ == '__main__':
+    benchmark_features(pd.read_csv(COMPANIES_PATH), pd.read_csv(LINKS_PATH))
+    benchmark_features(*synthetic_graph(20000, 100000))
@@ -0,0 +1,264 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+# relationship types counted by the SVN features, in the order of their feature columns
+COUNTED_RELATIONSHIPS = {
+    'sum_partnership': 'partnership',
+    'sum_customers': 'customer',
+    'sum_investment': 'investment',
+    'sum_competitor': 'competitor',
+}
+
+FEATURE_COLUMNS = ['num_links', 'mean_esg_neighbors', 'var_esg_neighbors', 'sum_esg_neighbors',
+                   *COUNTED_RELATIONSHIPS]
+
+# edge type of the relationships missing from the links table
+UNKNOWN_TYPE = 255
+
+# bounds of the multi-hop neighborhood features
+MAX_HOPS = 3
+MAX_EDGES = 100000
+
+
+class CSRGraph:
+    """
+    Compact undirected links graph stored as arrays.
+
+    Companies get integer ids in order of first appearance. The neighbors of company `i` are
+    `indices[offsets[i]:offsets[i + 1]]` and the relationship type of each of those edges is the matching
+    entry of `types`, a code into `relationships`. The graph holds the same edges `create_graph` would add
+    to a networkx graph, so the features it computes match `extract_features`.
+    """
+
+    def __init__(self, names, esg, offsets, indices, types, relationships):
+        self.names = names
+        self.esg = esg
+        self.offsets = offsets
+        self.indices = indices
+        self.types = types
+        self.relationships = relationships
+        self._adjacency = {}
+
+    @classmethod
+    def from_frames(cls, companies, links):
+        """
+        Builds the graph from the companies and links tables.
+
+        Args:
+            companies (pd.DataFrame): Companies with columns name and esg.
+            links (pd.DataFrame): Links with columns home_name, link_name and type.
+
+        Returns:
+            CSRGraph: The graph, with the last link between two companies winning, whatever its direction.
+        """
+        names = pd.Index(pd.unique(companies['name']))
+        n = len(names)
+
+        # the last ESG score of a duplicated company wins, as with `Graph.add_node`; missing scores are NaN,
+        # as `create_graph` reads them from `iterrows`
+        esg = np.full(n, np.nan)
+        esg[names.get_indexer(companies['name'])] = pd.to_numeric(companies['esg'], errors='coerce')
+
+        home = names.get_indexer(links['home_name'])
+        link = names.get_indexer(links['link_name'])
+        codes, relationships = pd.factorize(links['type'])
+        codes = np.where(codes < 0, UNKNOWN_TYPE, codes).astype(np.uint8)
+
+        known = (home >= 0) & (link >= 0)
+        home, link, codes = home[known], link[known], codes[known]
+        u, v = np.minimum(home, link).astype(np.int64), np.maximum(home, link).astype(np.int64)
+
+        # keep the last occurrence of every undirected edge
+        _, last = np.unique((u * n + v)[::-1], return_index=True)
+        keep = len(u) - 1 - last
+        u, v, codes = u[keep], v[keep], codes[keep]
+
+        # both directions of every edge, but a self-loop only once
+        loop = u == v
+        src = np.concatenate([u, v[~loop]])
+        dst = np.concatenate([v, u[~loop]])
+        edge_types = np.concatenate([codes, codes[~loop]])
+
+        order = np.argsort(src, kind='stable')
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=offsets[1:])
+
+        return cls(names, esg, offsets, dst[order], edge_types[order], list(relationships))
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def degree(self):
+        return np.diff(self.offsets)
+
+    def neighbors(self, name):
+        """
+        Args:
+            name (str): The company name.
+
+        Returns:
+            list: (neighbor name, relationship type) of every link of the company, None if it is not in the graph.
+        """
+        if name not in self.names:
+            return None
+        i = self.names.get_loc(name)
+        start, end = self.offsets[i], self.offsets[i + 1]
+        types = [self.relationships[code] if code < len(self.relationships) else None
+                 for code in self.types[start:end]]
+        return list(zip(self.names[self.indices[start:end]], types))
+
+    def feature_matrix(self):
+        """
+        Computes the SVN features of every company with segment reductions over the CSR arrays.
+
+        Returns:
+            np.ndarray: One row per company with the columns `FEATURE_COLUMNS`.
+        """
+        n = len(self)
+        degree = self.degree
+        rows = np.repeat(np.arange(n), degree)
+
+        # every neighbor has a score, possibly NaN, which propagates to the ESG features as in `extract_features`
+        values = self.esg[self.indices]
+        total = np.bincount(rows, weights=values, minlength=n)
+
+        linked = degree > 0
+        mean = np.divide(total, degree, out=np.zeros(n), where=linked)
+        deviation = values - mean[rows]
+        var = np.divide(np.bincount(rows, weights=deviation ** 2, minlength=n), degree, out=np.zeros(n),
+                        where=linked)
+
+        codes = {rel_type: code for code, rel_type in enumerate(self.relationships)}
+        counted = [np.bincount(rows[self.types == codes[rel_type]], minlength=n) if rel_type in codes
+                   else np.zeros(n, dtype=np.int64) for rel_type in COUNTED_RELATIONSHIPS.values()]
+
+        return np.column_stack([degree, mean, var, total, *counted])
+
+    def features_frame(self):
+        """
+        Returns:
+            pd.DataFrame: One row per company with its name, the columns `FEATURE_COLUMNS` and its ESG score.
+        """
+        df = pd.DataFrame(self.feature_matrix(), columns=FEATURE_COLUMNS)
+        counts = ['num_links', *COUNTED_RELATIONSHIPS]
+        df[counts] = df[counts].astype(int)
+        df['esg'] = self.esg
+        df.insert(0, 'name', self.names)
+        return df
+
+    def features(self):
+        """
+        Returns:
+            dict: Company name mapped to its features and ESG score, in the format of `extract_features`.
+        """
+        df = self.features_frame()
+        return {record.pop('name'): record for record in df.to_dict(orient='records')}
+
+    def adjacency(self, rel_type=None):
+        """
+        Args:
+            rel_type (str, optional): If given, only the edges of this relationship type are kept.
+
+        Returns:
+            sp.csr_matrix: The n x n adjacency matrix, with one entry per edge.
+        """
+        if rel_type not in self._adjacency:
+            rows = np.repeat(np.arange(len(self)), self.degree)
+            if rel_type is None:
+                mask = np.ones(len(self.indices), dtype=bool)
+            else:
+                code = self.relationships.index(rel_type) if rel_type in self.relationships else -1
+                mask = self.types == code
+            self._adjacency[rel_type] = sp.csr_matrix((np.ones(mask.sum()), (rows[mask], self.indices[mask])),
+                                                      shape=(len(self), len(self)))
+        return self._adjacency[rel_type]
+
+    def seed_matrix(self, companies, relationships=None, rel_type=None):
+        """
+        Links a virtual target company to some companies of the graph, as the webapp does for an unknown company.
+
+        Like `star_features`, a company listed twice is one link with its last relationship, a missing
+        relationship is 'unknown' and the relationships past the last company are ignored.
+
+        Args:
+            companies (list): The companies the target is linked to; unknown companies are ignored.
+            relationships (list, optional): The relationship type of each link.
+            rel_type (str, optional): If given, only the links of this relationship type are kept.
+
+        Returns:
+            sp.csr_matrix: A 1 x n matrix with a 1 for each company the target is linked to.
+        """
+        relationships = list(relationships or [])
+        links = {company: relationships[i] if i < len(relationships) else 'unknown'
+                 for i, company in enumerate(companies)}
+        ids = self.names.get_indexer(list(links))
+        mask = ids >= 0
+        if rel_type is not None:
+            mask &= np.array([link == rel_type for link in links.values()], dtype=bool)
+        ids = ids[mask]
+        return sp.csr_matrix((np.ones(len(ids)), (np.zeros(len(ids), dtype=np.int64), ids)), shape=(1, len(self)))
+
+    def neighborhood_features(self, companies, relationships, hops=2, max_edges=MAX_EDGES):
+        """
+        Multi-hop aggregates of a virtual target company linked to `companies`, computed with sparse products
+        over the adjacency of the whole links graph.
+
+        Only companies with a known ESG score are averaged. Every hop past the first costs the degree sum of
+        the current frontier; once `max_edges` would be exceeded the expansion stops and the remaining hop
+        features are None.
+
+        Args:
+            companies (list): The companies the target is linked to.
+            relationships (list): The relationship type of each link.
+            hops (int, optional): Number of hops to aggregate, at most `MAX_HOPS`. Defaults to 2.
+            max_edges (int, optional): Edge budget of the expansion. Defaults to `MAX_EDGES`.
+
+        Returns:
+            dict: For each counted relationship type the mean ESG of its neighbors, the degree-normalized ESG
+                score of the neighbors, and for each hop k >= 2 the number of companies first reached at k hops
+                and their mean ESG weighted by the number of paths reaching them.
+        """
+        hops = max(1, min(int(hops), MAX_HOPS))
+        known = np.isfinite(self.esg)
+        esg = np.where(known, self.esg, 0.0)
+        features = {}
+
+        for name, rel_type in COUNTED_RELATIONSHIPS.items():
+            seeds = self.seed_matrix(companies, relationships, rel_type)
+            features[f'mean_esg_{name[4:]}'] = _weighted_mean(seeds, esg, known)
+
+        frontier = self.seed_matrix(companies)
+        # each link is normalized by the degrees of both ends, counting the link to the target
+        target_degree = frontier.sum()
+        scale = np.sqrt(target_degree * (self.degree + 1))
+        normalized = frontier @ np.divide(esg, scale, out=np.zeros(len(self)), where=known & (scale > 0))
+        features['degree_normalized_esg'] = float(normalized[0])
+
+        visited = frontier.copy()
+        budget = max_edges
+        for k in range(2, hops + 1):
+            # the rows of the frontier companies are scanned once, however many paths reach them
+            cost = int(self.degree[frontier.indices].sum())
+            if frontier.nnz == 0 or cost > budget:
+                features[f'num_hop{k}'] = None if frontier.nnz else 0
+                features[f'mean_esg_hop{k}'] = None if frontier.nnz else 0
+                continue
+            budget -= cost
+
+            paths = frontier @ self.adjacency()
+            # companies already reached at a shorter distance do not count again
+            frontier = paths - paths.multiply(visited > 0)
+            frontier.eliminate_zeros()
+            visited = visited + frontier
+
+            features[f'num_hop{k}'] = frontier.nnz
+            features[f'mean_esg_hop{k}'] = _weighted_mean(frontier, esg, known)
+
+        return features
+
+
+def _weighted_mean(weights, values, known):
+    count = float((weights @ known.astype(float))[0])
+    return float((weights @ values)[0]) / count if count else 0
@@ -0,0 +1,186 @@
+import os
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+from esg_service_value_network.csr_graph import CSRGraph
+from esg_service_value_network.features import extract_features
+
+
+def canonical_links(links, names):
+    """
+    Reduces a links table to the edges that `create_graph` would add to the graph.
+
+    Links whose companies are not both known are dropped and, since the graph is undirected, only the last
+    link between two companies is kept, whatever its direction.
+
+    Args:
+        links (pd.DataFrame): Links with columns home_name, link_name and type.
+        names (set): Names of the known companies.
+
+    Returns:
+        dict: (home_name, link_name) mapped to the relationship type, with home_name <= link_name.
+    """
+    links = links[links['home_name'].isin(names) & links['link_name'].isin(names)]
+    home, link = links['home_name'].to_numpy(dtype=object), links['link_name'].to_numpy(dtype=object)
+    ordered = home <= link
+    return dict(zip(zip(np.where(ordered, home, link), np.where(ordered, link, home)), links['type']))
+
+
+class GraphFeatureStore:
+    """
+    Persisted per-company table of the graph features used by the SVN model.
+
+    The store keeps the links graph and the features of every company. When companies, links or ESG values
+    change, only the companies whose neighborhood changed have their features recomputed, with the same
+    `extract_features` used by the model.
+
+    The store is saved as three CSV files in its directory: nodes.csv (name, esg), links.csv (home_name,
+    link_name, type) and features.csv (name, the features and esg).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.graph = nx.Graph()
+        self.features = {}
+
+        if os.path.exists(os.path.join(path, 'features.csv')):
+            self._load()
+
+    def _load(self):
+        nodes = pd.read_csv(os.path.join(self.path, 'nodes.csv'))
+        links = pd.read_csv(os.path.join(self.path, 'links.csv'))
+        features = pd.read_csv(os.path.join(self.path, 'features.csv'))
+
+        self.graph.add_nodes_from((name, {'esg': esg}) for name, esg in zip(nodes['name'], nodes['esg']))
+        self.graph.add_edges_from((home, link, {'relationship': rel_type}) for home, link, rel_type
+                                  in zip(links['home_name'], links['link_name'], links['type']))
+        self.features = {record.pop('name'): record for record in features.to_dict(orient='records')}
+
+    def save(self):
+        """
+        Writes the store to its directory.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        pd.DataFrame([(name, data['esg']) for name, data in self.graph.nodes(data=True)],
+                     columns=['name', 'esg']).to_csv(os.path.join(self.path, 'nodes.csv'), index=False)
+        pd.DataFrame([(home, link, data['relationship']) for home, link, data in self.graph.edges(data=True)],
+                     columns=['home_name', 'link_name', 'type']).to_csv(os.path.join(self.path, 'links.csv'),
+                                                                        index=False)
+        self.frame().to_csv(os.path.join(self.path, 'features.csv'), index=False)
+
+    def frame(self):
+        """
+        Returns:
+            pd.DataFrame: One row per company with its name, its features and its ESG score.
+        """
+        return pd.DataFrame([{**features, 'name': name} for name, features in self.features.items()])
+
+    def get(self, name):
+        """
+        Args:
+            name (str): The company name.
+
+        Returns:
+            dict: The features of the company, as returned by `extract_features`, plus its ESG score.
+        """
+        return self.features[name]
+
+    def _recompute(self, names):
+        for name in names:
+            if name in self.graph:
+                feature = extract_features(self.graph, name)
+                feature['esg'] = self.graph.nodes[name]['esg']
+                self.features[name] = feature
+        return len(names)
+
+    def set_esg(self, name, esg):
+        """
+        Adds a company or updates its ESG score, then recomputes the features of its neighbors.
+        """
+        self.graph.add_node(name, esg=esg)
+        return self._recompute({name} | set(self.graph.neighbors(name)))
+
+    def remove_company(self, name):
+        """
+        Removes a company and its links, then recomputes the features of its former neighbors.
+        """
+        neighbors = set(self.graph.neighbors(name)) - {name}
+        self.graph.remove_node(name)
+        self.features.pop(name, None)
+        return self._recompute(neighbors)
+
+    def set_link(self, home_name, link_name, rel_type):
+        """
+        Adds a link between two known companies or updates its type, then recomputes their features.
+        """
+        self.graph.add_edge(home_name, link_name, relationship=rel_type)
+        return self._recompute({home_name, link_name})
+
+    def remove_link(self, home_name, link_name):
+        """
+        Removes the link between two companies, then recomputes their features.
+        """
+        self.graph.remove_edge(home_name, link_name)
+        return self._recompute({home_name, link_name})
+
+    def sync(self, companies, links):
+        """
+        Brings the store in line with the current companies and links tables, recomputing only the features
+        of the companies whose neighborhood changed.
+
+        Args:
+            companies (pd.DataFrame): Companies with columns name and esg.
+            links (pd.DataFrame): Links with columns home_name, link_name and type.
+
+        Returns:
+            int: The number of companies whose features were recomputed.
+        """
+        if not self.features:
+            return self._rebuild(companies, links)
+
+        graph = self.graph
+        esg = dict(zip(companies['name'], companies['esg']))
+        dirty = set()
+
+        for name in [name for name in graph if name not in esg]:
+            dirty |= set(graph.neighbors(name))
+            graph.remove_node(name)
+            self.features.pop(name, None)
+
+        for name, value in esg.items():
+            if name not in graph:
+                graph.add_node(name, esg=value)
+                dirty.add(name)
+            elif not _same(graph.nodes[name]['esg'], value):
+                graph.nodes[name]['esg'] = value
+                dirty.add(name)
+                dirty |= set(graph.neighbors(name))
+
+        current = {tuple(sorted((home, link))): data['relationship'] for home, link, data in graph.edges(data=True)}
+        target = canonical_links(links, set(esg))
+
+        for edge in current.keys() - target.keys():
+            graph.remove_edge(*edge)
+            dirty |= set(edge)
+        for edge, rel_type in target.items():
+            if current.get(edge) != rel_type:
+                graph.add_edge(*edge, relationship=rel_type)
+                dirty |= set(edge)
+
+        dirty &= set(graph)
+        return self._recompute(dirty)
+
+    def _rebuild(self, companies, links):
+        # a full build computes every company at once on the array-backed graph
+        csr = CSRGraph.from_frames(companies, links)
+        self.graph = nx.Graph()
+        self.graph.add_nodes_from((name, {'esg': esg}) for name, esg in zip(csr.names, csr.esg))
+        self.graph.add_edges_from((home, link, {'relationship': rel_type}) for (home, link), rel_type
+                                  in canonical_links(links, set(csr.names)).items())
+        self.features = csr.features()
+        return len(self.features)
+
+
+def _same(a, b):
+    return a == b or (pd.isna(a) and pd.isna(b))
@@ -0,0 +1,92 @@
+import numpy as np
+
+
+def extract_features(graph, company_name):
+    neighbors = list(graph.neighbors(company_name))
+    if not neighbors:
+        return {
+            'num_links': 0,
+            'mean_esg_neighbors': 0,
+            'var_esg_neighbors': 0,
+            'sum_esg_neighbors': 0,
+            'sum_partnership': 0,
+            'sum_customers': 0,
+            'sum_investment': 0,
+            'sum_competitor': 0,
+        }
+
+    esg_scores = [graph.nodes[neighbor].get('esg') for neighbor in neighbors if
+                  graph.nodes[neighbor].get('esg') is not None]
+    num_links = len(neighbors)
+
+    if not esg_scores:
+        return {
+            'num_links': num_links,
+            'mean_esg_neighbors': 0,
+            'var_esg_neighbors': 0,
+            'sum_esg_neighbors': 0,
+            'sum_partnership': sum(
+                1 for neighbor in neighbors if graph[company_name][neighbor]['relationship'] == 'partnership'),
+            'sum_customers': sum(
+                1 for neighbor in neighbors if graph[company_name][neighbor]['relationship'] == 'customer'),
+            'sum_investment': sum(
+                1 for neighbor in neighbors if graph[company_name][neighbor]['relationship'] == 'investment'),
+            'sum_competitor': sum(
+                1 for neighbor in neighbors if graph[company_name][neighbor]['relationship'] == 'competitor'),
+        }
+
+    mean_esg_neighbors = sum(esg_scores) / len(esg_scores)
+    var_esg_neighbors = np.var(esg_scores)
+    sum_esg_neighbors = sum(esg_scores)
+
+    sum_partnership = sum(1 for neighbor in neighbors if graph[company_name][neighbor]['relationship'] == 'partnership')
+    sum_customers = sum(1 for neighbor in neighbors if graph[company_name][neighbor]['relationship'] == 'customer')
+    sum_investment = sum(1 for neighbor in neighbors if graph[company_name][neighbor]['relationship'] == 'investment')
+    sum_competitor = sum(1 for neighbor in neighbors if graph[company_name][neighbor]['relationship'] == 'competitor')
+
+    return {
+        'num_links': num_links,
+        'mean_esg_neighbors': mean_esg_neighbors,
+        'var_esg_neighbors': var_esg_neighbors,
+        'sum_esg_neighbors': sum_esg_neighbors,
+        'sum_partnership': sum_partnership,
+        'sum_customers': sum_customers,
+        'sum_investment': sum_investment,
+        'sum_competitor': sum_competitor,
+    }
+
+
+def star_features(companies, relationships, esg_values):
+    """
+    Features of a target company linked only to `companies`, without building its star graph.
+
+    Gives the same result as `extract_features` on the star graph the webapp used to build: a company listed
+    twice is one neighbor with its last relationship, a missing relationship is 'unknown' and neighbors
+    whose ESG score is None are left out of the ESG features.
+
+    Args:
+        companies (list): The companies the target is linked to.
+        relationships (list): The relationship type of each link.
+        esg_values (list): The ESG score of each company, None if unknown.
+
+    Returns:
+        dict: The features, as returned by `extract_features`.
+    """
+    neighbors = {}
+    for i, company in enumerate(companies):
+        neighbors[company] = (esg_values[i], relationships[i] if i < len(relationships) else 'unknown')
+
+    esg_scores = [esg for esg, _ in neighbors.values() if esg is not None]
+    types = [rel_type for _, rel_type in neighbors.values()]
+    scored = bool(esg_scores)
+
+    return {
+        'num_links': len(neighbors),
+        'mean_esg_neighbors': sum(esg_scores) / len(esg_scores) if scored else 0,
+        'var_esg_neighbors': np.var(esg_scores) if scored else 0,
+        'sum_esg_neighbors': sum(esg_scores) if scored else 0,
+        'sum_partnership': types.count('partnership'),
+        'sum_customers': types.count('customer'),
+        'sum_investment': types.count('investment'),
+        'sum_competitor': types.count('competitor'),
+    }
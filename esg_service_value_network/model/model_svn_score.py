@@ -6,60 +6,15 @@ from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 from sklearn.model_selection import train_test_split
 import joblib
 from data_preparation.balancing import balancing_kmeans, balancing_smogn
+from esg_service_value_network.csr_graph import FEATURE_COLUMNS
+from esg_service_value_network.feature_store import GraphFeatureStore
+from utils.datasets import load_dataset
 
 model_path = 'saved/svn_score.pkl'
+feature_store_path = '../../data/svn_feature_store'
 
-
-def extract_features(graph, company_name):
-    neighbors = list(graph.neighbors(company_name))
-    if not neighbors:
-        return {
-            'num_links': 0,
-            'mean_esg_neighbors': 0,
-            'var_esg_neighbors': 0,
-            'sum_partnership': 0,
-            'sum_customers': 0,
-            'sum_investment': 0,
-            'sum_competitor': 0,
-        }
-
-    esg_scores = [graph.nodes[neighbor].get('esg') for neighbor in neighbors if
-                  graph.nodes[neighbor].get('esg') is not None]
-    num_links = len(neighbors)
-
-    if not esg_scores:
-        return {
-            'num_links': num_links,
-            'mean_esg_neighbors': 0,
-            'var_esg_neighbors': 0,
-            'sum_partnership': sum(
-                1 for neighbor in neighbors if graph[company_name][neighbor]['relationship'] == 'partnership'),
-            'sum_customers': sum(
-                1 for neighbor in neighbors if graph[company_name][neighbor]['relationship'] == 'customer'),
-            'sum_investment': sum(
-                1 for neighbor in neighbors if graph[company_name][neighbor]['relationship'] == 'investment'),
-            'sum_competitor': sum(
-                1 for neighbor in neighbors if graph[company_name][neighbor]['relationship'] == 'competitor'),
-        }
-
-    mean_esg_neighbors = sum(esg_scores) / len(esg_scores)
-    var_esg_neighbors = np.var(esg_scores)
-    #sum_esg_neighbors = sum(esg_scores)
-
-    sum_partnership = sum(1 for neighbor in neighbors if graph[company_name][neighbor]['relationship'] == 'partnership')
-    sum_customers = sum(1 for neighbor in neighbors if graph[company_name][neighbor]['relationship'] == 'customer')
-    sum_investment = sum(1 for neighbor in neighbors if graph[company_name][neighbor]['relationship'] == 'investment')
-    sum_competitor = sum(1 for neighbor in neighbors if graph[company_name][neighbor]['relationship'] == 'competitor')
-
-    return {
-        'num_links': num_links,
-        'mean_esg_neighbors': mean_esg_neighbors,
-        'var_esg_neighbors': var_esg_neighbors,
-        'sum_partnership': sum_partnership,
-        'sum_customers': sum_customers,
-        'sum_investment': sum_investment,
-        'sum_competitor': sum_competitor,
-    }
+# the features the webapp computes for a prediction, in the same order
+feature_names = FEATURE_COLUMNS
 
 
 def create_graph(companies, links):
@@ -75,26 +30,19 @@ def create_graph(companies, links):
     return G
 
 
-def train_save_model(companies_df, links_df, path):
-
-    G = create_graph(companies_df, links_df)
-
-    for _, row in companies_df.iterrows():
-        G.add_node(row['name'], esg=row['esg'])
+def load_feature_store(companies_df, links_df):
+    # only the companies whose neighborhood changed since the last run are recomputed
+    store = GraphFeatureStore(feature_store_path)
+    updated = store.sync(companies_df, links_df)
+    if updated:
+        store.save()
+    print(f"Feature store: {updated} companies updated")
+    return store
 
-    for _, row in links_df.iterrows():
-        if row['home_name'] in G and row['link_name'] in G:
-            G.add_edge(row['home_name'], row['link_name'], relationship=row['type'])
 
-    features = []
-    for node in G.nodes:
-        feature = extract_features(G, node)
-        feature['name'] = node
-        feature['esg'] = G.nodes[node]['esg']
-        features.append(feature)
+def train_save_model(companies_df, links_df, path):
 
-    features_df = pd.DataFrame(features)
-    feature_names = ['num_links', 'mean_esg_neighbors', 'var_esg_neighbors', 'sum_partnership', 'sum_customers', 'sum_investment', 'sum_competitor']
+    features_df = load_feature_store(companies_df, links_df).frame()
 
     #X, y = balancing_kmeans(features_df[feature_names + ['esg']], n_cluster=3)
     X, y = balancing_smogn(features_df[feature_names + ['esg']])
@@ -117,10 +65,8 @@ def train_save_model(companies_df, links_df, path):
 def test_model(companies_df, links_df, company_name):
     model = joblib.load(model_path)
 
-    G = create_graph(companies_df, links_df)
-    company_features = extract_features(G, company_name)
+    company_features = load_feature_store(companies_df, links_df).get(company_name)
 
-    feature_names = ['num_links', 'mean_esg_neighbors', 'var_esg_neighbors', 'sum_partnership', 'sum_customers', 'sum_investment', 'sum_competitor']
     feature_vector = np.array([company_features[feature] for feature in feature_names]).reshape(1, -1)
 
     predicted_esg = model.predict(feature_vector)[0]
@@ -128,7 +74,7 @@ def test_model(companies_df, links_df, company_name):
 
 
 if __name__ == '__main__':
-    companies_df = pd.read_csv('../../data/label_with_metrics.csv')
-    links_df = pd.read_csv('../../data/filtered_links.csv')
+    companies_df = load_dataset('../../data/label_with_metrics.csv')
+    links_df = load_dataset('../../data/filtered_links.csv')
     train_save_model(companies_df, links_df, model_path)
     print(test_model(companies_df, links_df, 'IBM'))
@@ -0,0 +1,172 @@
+"""
+Headless Chrome sessions shared by the Selenium scrapers.
+
+Starting Chrome and accepting the cookie banner takes seconds, so the scrapers lease warm drivers from a
+`BrowserPool` instead of starting a new browser for every ticker. A driver is quit after `max_uses` leases, or
+as soon as its session or its connection fails, and replaced by a new one on the next lease. A page that times
+out or misses an element leaves the driver usable.
+"""
+
+import queue
+import threading
+from contextlib import contextmanager
+
+from selenium import webdriver
+from selenium.common.exceptions import (NoSuchElementException, StaleElementReferenceException, TimeoutException,
+                                        WebDriverException)
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.wait import WebDriverWait
+
+# errors of the page rather than of the browser, which keep the driver in the pool
+PAGE_ERRORS = (TimeoutException, NoSuchElementException, StaleElementReferenceException)
+
+
+def new_driver():
+    """
+    Starts a headless Chrome.
+
+    Returns:
+        webdriver.Chrome: The driver. The caller must quit it.
+    """
+    options = Options()
+    options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+
+    return webdriver.Chrome(options=options)
+
+
+def accept_cookies(driver, button_id):
+    """
+    Clicks the button of the cookie banner if the page shows it; a warm driver has already accepted them.
+
+    Args:
+        driver (webdriver.Chrome): The driver.
+        button_id (str): The id of the accept button.
+
+    Returns:
+        bool: Whether the banner was shown.
+    """
+    buttons = driver.find_elements(By.ID, button_id)
+    if buttons and buttons[0].is_displayed():
+        buttons[0].click()
+        return True
+    return False
+
+
+def wait_until(driver, condition, timeout):
+    """
+    Waits for an expected condition instead of sleeping a fixed time.
+
+    Args:
+        driver (webdriver.Chrome): The driver.
+        condition (callable): An expected condition, e.g. `EC.visibility_of_element_located(locator)`.
+        timeout (float): Maximum number of seconds to wait.
+
+    Returns:
+        object: The value of the condition, or None if it did not hold within `timeout`.
+    """
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=0.1).until(condition)
+    except TimeoutException:
+        return None
+
+
+class _Session:
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+
+
+class BrowserPool:
+    """
+    Pool of at most `size` warm drivers, leased to one scraping task at a time.
+    """
+
+    def __init__(self, size=2, max_uses=50, warm_up=None):
+        """
+        Args:
+            size (int, optional): Maximum number of drivers alive at the same time. Defaults to 2.
+            max_uses (int, optional): Number of leases after which a driver is replaced. Defaults to 50.
+            warm_up (callable, optional): Called with every new driver, e.g. to open the site and accept cookies.
+        """
+        self.size = size
+        self.max_uses = max_uses
+        self.warm_up = warm_up
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+
+    def _start(self):
+        session = _Session(new_driver())
+        try:
+            if self.warm_up is not None:
+                self.warm_up(session.driver)
+        except Exception:
+            session.driver.quit()
+            raise
+        return session
+
+    @contextmanager
+    def lease(self):
+        """
+        Leases a warm driver, starting one if none is idle.
+
+        Yields:
+            webdriver.Chrome: The driver, returned to the pool when the block exits, or quit if its session failed.
+        """
+        if self._closed:
+            raise RuntimeError('The browser pool is closed')
+
+        self._slots.acquire()
+        session = None
+        try:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                session = self._start()
+
+            yield session.driver
+        except PAGE_ERRORS:
+            raise
+        except WebDriverException:
+            # the browser crashed or lost its session, it is replaced on the next lease
+            self._quit(session)
+            session = None
+            raise
+        finally:
+            if session is not None:
+                session.uses += 1
+                if session.uses >= self.max_uses or self._closed:
+                    self._quit(session)
+                else:
+                    self._idle.put(session)
+            self._slots.release()
+
+    @staticmethod
+    def _quit(session):
+        if session is None:
+            return
+        try:
+            session.driver.quit()
+        except WebDriverException:
+            pass
+
+    def close(self):
+        """
+        Quits the idle drivers; the leased ones are quit when they are returned.
+        """
+        self._closed = True
+        while True:
+            try:
+                self._quit(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -2,7 +2,10 @@
 Module to scrape ESG scores from Sustainalytics and update a MongoDB database.
 
 Functions:
-    scrape_sustainalytics(ticker: str) -> float
+    warm_up(driver: webdriver.Chrome) -> None
+        Opens the Sustainalytics ratings page and accepts its cookies.
+
+    scrape_sustainalytics(ticker: str, driver: webdriver.Chrome = None) -> float
         Scrapes the Sustainalytics page for the ESG esg_company_data of a given ticker.
 
     add_to_mongodb(company_name: str, esg: float) -> None
@@ -11,61 +14,82 @@ Functions:
     update_all_companies() -> None
         Updates all companies in the MongoDB database with their ESG scores from Sustainalytics.
 
+    update_company(company_doc: dict) -> None
+        Scrapes and stores the ESG score of one company.
+
 Usage:
     To update all companies in the database with their ESG scores, run this module directly.
 """
 
 import re
-from selenium import webdriver
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.action_chains import ActionChains
-from time import sleep
 from selenium.webdriver.support.wait import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from scraping.browser import accept_cookies, new_driver, wait_until
+from scraping.timing import StepTimer
 from utils import connector
 
+SUSTAINALYTICS_URL = 'https://www.sustainalytics.com/esg-ratings'
+COOKIES_BUTTON = 'hs-eu-confirmation-button'
+
+# seconds to wait for the search results and for the rating page
+RESULTS_TIMEOUT = 3
+PAGE_TIMEOUT = 10
+
 
-def scrape_sustainalytics(ticker):
+def warm_up(driver):
+    """
+    Opens the Sustainalytics ratings page and accepts its cookies, for a driver of the browser pool.
+
+    Args:
+        driver (webdriver.Chrome): The new driver.
+    """
+    driver.get(SUSTAINALYTICS_URL)
+    accept_cookies(driver, COOKIES_BUTTON)
+
+
+def scrape_sustainalytics(ticker, driver=None):
     """
     Scrapes the Sustainalytics page for the ESG esg_company_data of a given ticker.
 
     Args:
         ticker (str): The stock ticker of the company.
+        driver (webdriver.Chrome, optional): A driver leased from a browser pool. If None, a new browser is
+            started and quit once done.
 
     Returns:
         float: The ESG esg_company_data of the company, or 'null' if not found.
     """
-    score = 'null'
-
-    # browser options
-    options = Options()
-    options.add_argument("--headless")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-
-    # initialize the webdriver
-    driver = webdriver.Chrome(options=options)
+    if driver is None:
+        driver = new_driver()
+        try:
+            return scrape_sustainalytics(ticker, driver)
+        finally:
+            driver.quit()
 
-    driver.get('https://www.sustainalytics.com/esg-ratings')
-    action = ActionChains(driver)
-
-    # accept cookies
-    cookies_button = driver.find_element(By.ID, 'hs-eu-confirmation-button')
-    cookies_button.click()
-
-    driver.find_element(By.ID, 'searchInput').send_keys(':')
-
-    for char in ticker:
-        driver.find_element(By.ID, 'searchInput').send_keys(char)
-        sleep(0.5)
-
-    sleep(1)
-    action.send_keys(Keys.TAB).perform()
-    action.send_keys(Keys.ENTER).perform()
-
-    element = WebDriverWait(driver, 10).until(EC.presence_of_all_elements_located((By.CLASS_NAME, 'row')))
+    score = 'null'
+    timer = StepTimer('sustainalytics')
+
+    with timer.step('load'):
+        driver.get(SUSTAINALYTICS_URL)
+        action = ActionChains(driver)
+
+        # accept cookies
+        accept_cookies(driver, COOKIES_BUTTON)
+
+    # the results list the identifiers, e.g. NAS:AAPL: select the first one once the ticker shows up
+    with timer.step('search'):
+        driver.find_element(By.ID, 'searchInput').send_keys(':' + ticker)
+        wait_until(driver, EC.presence_of_element_located((By.XPATH, f"//a[contains(., ':{ticker}')]")),
+                   RESULTS_TIMEOUT)
+        action.send_keys(Keys.TAB).perform()
+        action.send_keys(Keys.ENTER).perform()
+
+    with timer.step('rating'):
+        element = WebDriverWait(driver, PAGE_TIMEOUT).until(
+            EC.presence_of_all_elements_located((By.CLASS_NAME, 'row')))
     info = element[14].text + element[15].text
 
     # find pattern in the text
@@ -89,18 +113,25 @@ def add_to_mongodb(company_name, esg):
         company_name (str): The name of the company.
         esg (float): The ESG esg_company_data of the company.
     """
-    query = {"name": company_name}
-    existing_entry = connector.companies.find_one(query)
-    if existing_entry and 'esg' not in existing_entry:
-        connector.companies.update_one(query, {"$set": {"esg": esg}})
+    connector.writer.set_missing(company_name, {"esg": esg})
 
 
 def update_all_companies():
     """
     Updates all companies in the MongoDB database with their ESG scores from Sustainalytics.
     """
-    for company_doc in connector.companies.find({"esg": {"$exists": False}}):
-        if company_doc['ticker'] != 'null':
-            esg = scrape_sustainalytics(ticker=company_doc['ticker'])
-            add_to_mongodb(company_name=company_doc['name'], esg=esg)
+    from scraping.orchestrator import run
+    run(['sustainalytics'])
     print('Done')
+
+
+def update_company(company_doc, driver=None):
+    """
+    Scrapes and stores the ESG score of one company.
+
+    Args:
+        company_doc (dict): The company, with its name and ticker.
+        driver (webdriver.Chrome, optional): A driver leased from a browser pool.
+    """
+    esg = scrape_sustainalytics(ticker=company_doc['ticker'], driver=driver)
+    add_to_mongodb(company_name=company_doc['name'], esg=esg)
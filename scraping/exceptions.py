@@ -0,0 +1,32 @@
+class RateLimitError(Exception):
+    """
+    Raised when a source answers 429 Too Many Requests.
+
+    The caller decides how long to back off, instead of the scraper sleeping and restarting its whole loop.
+    """
+
+    def __init__(self, url, retry_after=None):
+        """
+        Args:
+            url (str): The rate-limited URL.
+            retry_after (float, optional): Seconds to wait, from the Retry-After header if the source sent one.
+        """
+        super().__init__(f"Rate limited on {url}")
+        self.url = url
+        self.retry_after = retry_after
+
+
+def retry_after_seconds(response):
+    """
+    Reads the Retry-After header of a response, given in seconds.
+
+    Args:
+        response (requests.Response): The 429 response.
+
+    Returns:
+        float: The number of seconds, or None if the header is missing or is not a number.
+    """
+    try:
+        return float(response.headers['Retry-After'])
+    except (KeyError, ValueError):
+        return None
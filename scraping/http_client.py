@@ -0,0 +1,173 @@
+"""
+HTTP client of the requests-based scrapers.
+
+`requests.get` opens a new connection for every ticker and waits forever on a stuck socket. `HttpClient` instead:
+
+    keeps the connections alive, with one pooled `requests.Session` per worker thread
+    sets a connect and read timeout on every request
+    retries connection errors and 5xx answers with exponential backoff and full jitter
+    caches the 200 answers on disk, with their ETag and Last-Modified validators
+
+A cached page younger than `max_age` is served without any request. An older one is revalidated with
+If-None-Match / If-Modified-Since and served from the disk on 304 Not Modified, so re-running a scrape does not
+download the unchanged pages again. The cache is in data/.cache/http of the repository, whatever the working
+directory, or in the directory of the HTTP_CACHE_DIR environment variable.
+
+A 429 is not retried here: it is returned to the scraper, which raises `RateLimitError` so that the orchestrator
+pauses the whole host.
+"""
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from scraping.exceptions import retry_after_seconds
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.environ.get('HTTP_CACHE_DIR', os.path.join(REPO_DIR, 'data', '.cache', 'http'))
+TIMEOUT = (5, 30)
+RETRIES = 3
+BACKOFF = 1.0
+MAX_BACKOFF = 30.0
+MAX_AGE = 24 * 60 * 60
+POOL_SIZE = 8
+
+RETRY_STATUSES = {500, 502, 503, 504}
+CACHED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+class HttpClient:
+    """
+    Pooled HTTP client with timeouts, retries and an on-disk cache of the GET answers.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, timeout=TIMEOUT, retries=RETRIES, max_age=MAX_AGE):
+        """
+        Args:
+            cache_dir (str, optional): Directory of the cached answers, or None to disable the cache.
+                Defaults to `CACHE_DIR`.
+            timeout (tuple, optional): Connect and read timeout in seconds. Defaults to `TIMEOUT`.
+            retries (int, optional): Number of retries of a failed request. Defaults to `RETRIES`.
+            max_age (float, optional): Seconds during which a cached answer is served without revalidating it.
+                Defaults to one day.
+        """
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.retries = retries
+        self.max_age = max_age
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        """
+        The session of the calling thread: sessions keep their connections alive but are not thread-safe.
+        """
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            self._local.session = session
+        return session
+
+    def get(self, url, headers=None):
+        """
+        Fetches a page, from the disk cache when it is fresh or not modified.
+
+        Args:
+            url (str): The URL.
+            headers (dict, optional): Headers of the request, e.g. the User-Agent.
+
+        Returns:
+            requests.Response: The answer. `from_cache` is True when the body comes from the disk.
+
+        Raises:
+            requests.RequestException: If the request still fails after the retries.
+        """
+        entry = self._load(url)
+        if entry is not None and time.time() - entry['fetched_at'] < self.max_age:
+            return self._cached_response(url, entry)
+
+        headers = dict(headers or {})
+        if entry is not None:
+            if 'ETag' in entry['headers']:
+                headers['If-None-Match'] = entry['headers']['ETag']
+            if 'Last-Modified' in entry['headers']:
+                headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+
+        response = self._request(url, headers)
+
+        if response.status_code == 304 and entry is not None:
+            entry['fetched_at'] = time.time()
+            self._store(url, entry)
+            return self._cached_response(url, entry)
+
+        response.from_cache = False
+        if response.status_code == 200:
+            self._store(url, {'url': url, 'fetched_at': time.time(), 'body': response.text,
+                              'headers': {name: response.headers[name]
+                                          for name in CACHED_HEADERS if name in response.headers}})
+        return response
+
+    def _request(self, url, headers):
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if last:
+                    raise
+                delay = None
+            else:
+                if response.status_code not in RETRY_STATUSES or last:
+                    return response
+                delay = retry_after_seconds(response)
+
+            # full jitter: workers that failed together do not retry together
+            if delay is None:
+                delay = random.uniform(0, BACKOFF * 2 ** attempt)
+            time.sleep(min(delay, MAX_BACKOFF))
+
+    def _path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode()).hexdigest() + '.json')
+
+    def _load(self, url):
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self._path(url), encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, url, entry):
+        if self.cache_dir is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(url)
+        # write then rename, so that a concurrent reader never sees half a file
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(entry, file)
+        os.replace(temporary, path)
+
+    @staticmethod
+    def _cached_response(url, entry):
+        response = requests.Response()
+        response.url = url
+        response.status_code = 200
+        response.headers.update(entry['headers'])
+        response._content = entry['body'].encode('utf-8')
+        response.encoding = 'utf-8'
+        response.from_cache = True
+        return response
+
+
+client = HttpClient()
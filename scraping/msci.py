@@ -1,11 +1,21 @@
-from selenium import webdriver
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.action_chains import ActionChains
-from time import sleep
+from selenium.webdriver.support import expected_conditions as EC
+from scraping.browser import accept_cookies, new_driver, wait_until
+from scraping.timing import StepTimer
 from utils import connector
 
+MSCI_URL = "https://www.msci.com/our-solutions/esg-investing/esg-ratings-climate-search-tool/"
+COOKIES_BUTTON = 'onetrust-accept-btn-handler'
+
+# seconds to wait for the search suggestions, the company page and each section to show up
+SUGGESTIONS_TIMEOUT = 3
+PAGE_TIMEOUT = 10
+SECTION_TIMEOUT = 5
+
+SUGGESTIONS = (By.CSS_SELECTOR, '.ui-autocomplete .ui-menu-item, [role="option"]')
+
 
 def sdg_to_dict(info_scraped):
     """
@@ -166,95 +176,116 @@ def involvement_to_dict(info_scraped):
     return business_involvements_dict
 
 
-def scrape_msci(ticker):
+def warm_up(driver):
+    """
+    Opens the MSCI search tool and accepts its cookies, for a driver of the browser pool.
+
+    Args:
+        driver (webdriver.Chrome): The new driver.
+    """
+    driver.get(MSCI_URL)
+    accept_cookies(driver, COOKIES_BUTTON)
+
+
+def scrape_msci(ticker, driver=None):
     """
     Scrapes MSCI website for ESG-related esg_company_data based on the given ticker.
 
     Args:
         ticker (str): The stock ticker symbol to search for.
+        driver (webdriver.Chrome, optional): A driver leased from a browser pool. If None, a new browser is
+            started and quit once done.
 
     Returns:
         tuple: Contains decarbonization target dictionary, global temperature goal, controversies dictionary,
                involvement dictionary, and SDG dictionary.
     """
 
+    if driver is None:
+        driver = new_driver()
+        try:
+            return scrape_msci(ticker, driver)
+        finally:
+            driver.quit()
+
     decarbonization_target_dict = 'null'
     global_temperature_goal = 'null'
     controversies_dict = 'null'
     involvement_dict = 'null'
     sdg_dict = 'null'
 
-    # browser options
-    options = Options()
-    options.add_argument("--headless")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-
-    # initialize the webdriver
-    driver = webdriver.Chrome(options=options)
+    timer = StepTimer('msci')
 
     # Visita la pagina di MSCI
-    driver.get("https://www.msci.com/our-solutions/esg-investing/esg-ratings-climate-search-tool/")
-    action = ActionChains(driver)
-
-    # accept cookies
-    cookies_button = driver.find_element(By.ID, 'onetrust-accept-btn-handler')
-    cookies_button.click()
-
-    # find search bar and send ticker
-    driver.find_element(By.ID, '_esgratingsprofile_keywords').send_keys(ticker)
-    sleep(2)
-    action.send_keys(Keys.DOWN).perform()
-    action.send_keys(Keys.ENTER).perform()
-    sleep(1)
-
+    with timer.step('load'):
+        driver.get(MSCI_URL)
+        action = ActionChains(driver)
+
+        # accept cookies
+        accept_cookies(driver, COOKIES_BUTTON)
+
+    # find search bar and send ticker, then pick the first suggestion once the list shows up
+    with timer.step('search'):
+        driver.find_element(By.ID, '_esgratingsprofile_keywords').send_keys(ticker)
+        wait_until(driver, EC.visibility_of_element_located(SUGGESTIONS), SUGGESTIONS_TIMEOUT)
+        action.send_keys(Keys.DOWN).perform()
+        action.send_keys(Keys.ENTER).perform()
+        wait_until(driver, EC.element_to_be_clickable((By.ID, "esg-commitment-toggle-link")), PAGE_TIMEOUT)
+
+    # every section is loaded when its toggle is clicked: wait until its content is visible
     try:
         # retrieve decarbonization target
-        driver.find_element(By.ID, "esg-commitment-toggle-link").click()
-        sleep(1)
-        decarbonization_target = driver.find_elements(By.CLASS_NAME, "decarbonization-target-row")
-        decarbonization_target_dict = decarbonization_target_to_dict(decarbonization_target)
+        with timer.step('commitment'):
+            driver.find_element(By.ID, "esg-commitment-toggle-link").click()
+            decarbonization_target = wait_until(driver, EC.visibility_of_all_elements_located(
+                (By.CLASS_NAME, "decarbonization-target-row")), SECTION_TIMEOUT)
+            decarbonization_target_dict = decarbonization_target_to_dict(decarbonization_target)
 
     except Exception:
         pass
 
     try:
         # retrieve climate esg_company_data
-        driver.find_element(By.ID, "esg-climate-toggle-link").click()
-        sleep(1)
-        global_temperature_goal = float(driver.find_element(By.CLASS_NAME, "implied-temp-rise-value")
-                                        .text.removesuffix("°C"))
-        sleep(1)
+        with timer.step('climate'):
+            driver.find_element(By.ID, "esg-climate-toggle-link").click()
+            temperature = wait_until(driver, EC.visibility_of_element_located(
+                (By.CLASS_NAME, "implied-temp-rise-value")), SECTION_TIMEOUT)
+            global_temperature_goal = float(temperature.text.removesuffix("°C"))
 
     except Exception:
         pass
 
     try:
         # retrieve controversies
-        driver.find_element(By.ID, 'esg-controversies-toggle-link').click()
-        sleep(1)
-        parent = driver.find_element(By.ID, "controversies-table")
-        controversies_dict = controversies_to_dict(parent.find_elements(By.TAG_NAME, 'div'))
+        with timer.step('controversies'):
+            driver.find_element(By.ID, 'esg-controversies-toggle-link').click()
+            parent = wait_until(driver, EC.visibility_of_element_located((By.ID, "controversies-table")),
+                                SECTION_TIMEOUT)
+            controversies_dict = controversies_to_dict(parent.find_elements(By.TAG_NAME, 'div'))
 
     except Exception:
         pass
 
     try:
         # retrieve business involvement esg_company_data
-        driver.find_element(By.ID, 'esg-involvement-toggle-link').click()
-        sleep(1)
-        involvement_dict = involvement_to_dict(driver.find_elements(By.CLASS_NAME, "business-involvement-column"))
+        with timer.step('involvement'):
+            driver.find_element(By.ID, 'esg-involvement-toggle-link').click()
+            involvement = wait_until(driver, EC.visibility_of_all_elements_located(
+                (By.CLASS_NAME, "business-involvement-column")), SECTION_TIMEOUT)
+            involvement_dict = involvement_to_dict(involvement)
 
     except Exception:
         pass
 
     try:
         # sustainable development goal
-        driver.find_element(By.ID, "esg-sdg-alignment-toggle-link").click()
-        sleep(1)
-        table = driver.find_element(By.ID, 'esg-sdg-alignment-toggle').find_element(By.CLASS_NAME, "col-md-6")
-        value = table.find_elements(By.TAG_NAME, 'div')
-        sdg_dict = sdg_to_dict(value)
+        with timer.step('sdg'):
+            driver.find_element(By.ID, "esg-sdg-alignment-toggle-link").click()
+            wait_until(driver, EC.visibility_of_element_located((By.ID, 'esg-sdg-alignment-toggle')),
+                       SECTION_TIMEOUT)
+            table = driver.find_element(By.ID, 'esg-sdg-alignment-toggle').find_element(By.CLASS_NAME, "col-md-6")
+            value = table.find_elements(By.TAG_NAME, 'div')
+            sdg_dict = sdg_to_dict(value)
 
     except Exception:
         pass
@@ -270,10 +301,21 @@ def update_all_companies_score():
     MongoDB database.
     """
 
-    for company_doc in connector.companies.find({"sdg": {"$exists": False}, "ticker": {"$exists": True}}):
-        if company_doc['ticker'] != 'null':
-            dec_dict, temp_goal, contr_dict, inv_dict, sdg_dict = scrape_msci(ticker=company_doc['ticker'])
-            add_into_mongodb(company_doc['name'], dec_dict, temp_goal, contr_dict, inv_dict, sdg_dict)
+    from scraping.orchestrator import run
+    run(['msci'])
+
+
+def update_company(company_doc, driver=None):
+    """
+    Scrapes and stores the MSCI esg_company_data of one company.
+
+    Args:
+        company_doc (dict): The company, with its name and ticker.
+        driver (webdriver.Chrome, optional): A driver leased from a browser pool.
+    """
+    dec_dict, temp_goal, contr_dict, inv_dict, sdg_dict = scrape_msci(ticker=company_doc['ticker'],
+                                                                      driver=driver)
+    add_into_mongodb(company_doc['name'], dec_dict, temp_goal, contr_dict, inv_dict, sdg_dict)
 
 
 def update_single_company(ticker):
@@ -283,6 +325,7 @@ def update_single_company(ticker):
     company = connector.companies.find_one({"ticker": ticker})
     dec_dict, temp_goal, contr_dict, inv_dict, sdg_dict = scrape_msci(ticker=ticker)
     add_into_mongodb(company['name'], dec_dict, temp_goal, contr_dict, inv_dict, sdg_dict)
+    connector.writer.flush()
 
 
 def add_into_mongodb(company_name, dec_dict, temp_goal, contr_dict, inv_dict, sdg_dict):
@@ -298,23 +341,11 @@ def add_into_mongodb(company_name, dec_dict, temp_goal, contr_dict, inv_dict, sd
         sdg_dict (dict): Sustainable Development Goals (SDG) dictionary.
     """
 
-    query = {"name": company_name}
-    existing_entry = connector.companies.find_one(query)
-    if existing_entry:
-        update_fields = {}
-
-        if 'Decarbonization Target' not in existing_entry:
-            update_fields["Decarbonization Target"] = dec_dict
-        if 'Temperature Goal' not in existing_entry:
-            update_fields["Temperature Goal"] = temp_goal
-        if 'Controversies' not in existing_entry:
-            update_fields["Controversies"] = contr_dict
-        if 'involvement msci' not in existing_entry:
-            update_fields["involvement_msci"] = inv_dict
-        if 'sdg' not in existing_entry:
-            update_fields["sdg"] = sdg_dict
-
-        if update_fields:
-            new_values = {"$set": update_fields}
-            connector.companies.update_one(query, new_values)
-            print(f'Done for {existing_entry['ticker']}')
+    connector.writer.set_missing(company_name, {
+        "Decarbonization Target": dec_dict,
+        "Temperature Goal": temp_goal,
+        "Controversies": contr_dict,
+        "involvement_msci": inv_dict,
+        "sdg": sdg_dict,
+    })
+    print(f'Done for {company_name}')
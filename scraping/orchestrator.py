@@ -0,0 +1,307 @@
+"""
+Concurrent orchestrator of the scrapers.
+
+Every source scrapes one company at a time through the `update_company` function of its module. The
+orchestrator runs those calls in worker threads with:
+
+    bounded concurrency per source, e.g. a few headless browsers for MSCI but more HTTP workers for tickers
+    a pool of warm browsers per Selenium source, reused across companies
+    per-host rate limiting, shared by the sources that scrape the same host
+    backoff on 429 Too Many Requests, pausing the whole host for the Retry-After delay or an exponential one
+    a persistent SQLite job queue, so that an interrupted refresh resumes where it stopped
+    batched writes: the scrapers buffer their updates in `connector.writer`, flushed in bulk; a job is only
+    marked done once its updates are flushed, so the jobs of a crashed run whose updates were lost run again
+
+At the end of a run the time spent in each step of the Selenium scrapers is printed, see `scraping.timing`.
+
+Usage:
+    python -m scraping.orchestrator msci employees --db scraping_jobs.sqlite
+"""
+
+import argparse
+import asyncio
+import sqlite3
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from scraping import esg, msci, ticker, yahoo_finance
+from scraping.browser import BrowserPool
+from scraping.exceptions import RateLimitError
+from scraping.stockanalysis import altman_piotroski, employees, fundamentals
+from scraping.timing import print_timing_profile
+from utils import connector
+
+QUEUE_PATH = 'scraping_jobs.sqlite'
+MAX_ATTEMPTS = 3
+BACKOFF = 60.0
+MAX_BACKOFF = 900.0
+BROWSER_MAX_USES = 50
+
+# warm_up is set for the Selenium sources, which get a pool of `concurrency` browsers
+Source = namedtuple('Source', ['update', 'query', 'host', 'concurrency', 'interval', 'warm_up'], defaults=(None,))
+
+WITH_TICKER = {'ticker': {'$exists': True, '$ne': 'null'}}
+
+SOURCES = {
+    'tickers': Source(ticker.update_company, {'ticker': {'$exists': False}}, 'investing.com', 4, 1.0),
+    'sustainalytics': Source(esg.update_company, {'esg': {'$exists': False}, **WITH_TICKER},
+                             'sustainalytics.com', 2, 2.0, esg.warm_up),
+    'msci': Source(msci.update_company, {'sdg': {'$exists': False}, **WITH_TICKER}, 'msci.com', 2, 2.0,
+                   msci.warm_up),
+    'yahoo_finance': Source(yahoo_finance.update_company, {'involvement': {'$exists': False}, **WITH_TICKER},
+                            'finance.yahoo.com', 2, 2.0, yahoo_finance.warm_up),
+    'altman_piotroski': Source(altman_piotroski.update_company,
+                               {'altman_score': {'$exists': False}, 'piotroski_score': {'$exists': False},
+                                **WITH_TICKER},
+                               'stockanalysis.com', 4, 0.5),
+    'employees': Source(employees.update_company, {'employees': {'$exists': False}, **WITH_TICKER},
+                        'stockanalysis.com', 4, 0.5),
+    # both stockanalysis.com pages of a company in one job, instead of the two sources above; the job fetches
+    # them one after the other, so its interval is the interval of the single sources twice
+    'stockanalysis': Source(fundamentals.update_company,
+                            {'$or': [{field: {'$exists': False}} for field in fundamentals.FIELDS], **WITH_TICKER},
+                            'stockanalysis.com', 4, 1.0),
+}
+
+
+class JobQueue:
+    """
+    SQLite table of the (source, company) jobs with their status: pending, running, done or failed.
+
+    Only the event loop thread uses the connection; the scraping itself runs in worker threads.
+    """
+
+    def __init__(self, path=QUEUE_PATH):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                source TEXT NOT NULL,
+                name TEXT NOT NULL,
+                ticker TEXT,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                not_before REAL NOT NULL DEFAULT 0,
+                error TEXT,
+                updated_at REAL,
+                PRIMARY KEY (source, name)
+            )
+        """)
+        # jobs left running by a crashed run start over
+        self.connection.execute("UPDATE jobs SET status = 'pending' WHERE status = 'running'")
+        self.connection.commit()
+
+    def enqueue(self, source, company_docs):
+        """
+        Adds a pending job for every company that is not already queued for the source. A company whose job is
+        done or failed is still missing the data, so its job is put back in the queue with its attempts reset.
+
+        Returns:
+            int: The number of jobs added or put back.
+        """
+        before = self.connection.total_changes
+        self.connection.executemany(
+            "INSERT INTO jobs (source, name, ticker, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (source, name) DO UPDATE SET status = 'pending', attempts = 0, not_before = 0, "
+            "error = NULL, ticker = excluded.ticker, updated_at = excluded.updated_at "
+            "WHERE status IN ('done', 'failed')",
+            ((source, doc['name'], doc.get('ticker'), time.time()) for doc in company_docs))
+        self.connection.commit()
+        return self.connection.total_changes - before
+
+    def claim(self, source):
+        """
+        Marks the next pending job of the source as running.
+
+        Returns:
+            tuple: (job status, company doc), where the status is 'ready' with the company to scrape, 'wait'
+                with the number of seconds until a delayed job is due, or 'empty' when nothing is pending.
+        """
+        row = self.connection.execute(
+            "SELECT name, ticker, not_before FROM jobs WHERE source = ? AND status = 'pending' "
+            "ORDER BY not_before LIMIT 1", (source,)).fetchone()
+        if row is None:
+            return 'empty', None
+        name, company_ticker, not_before = row
+        if not_before > time.time():
+            return 'wait', not_before - time.time()
+
+        self.connection.execute("UPDATE jobs SET status = 'running', updated_at = ? WHERE source = ? AND name = ?",
+                                (time.time(), source, name))
+        self.connection.commit()
+        return 'ready', {'name': name, 'ticker': company_ticker}
+
+    def complete(self, source, name):
+        self._set(source, name, status='done', error=None)
+
+    def retry(self, source, name, delay, error, count_attempt=True):
+        """
+        Puts a job back in the queue after `delay` seconds, or marks it failed after `MAX_ATTEMPTS` attempts.
+        A rate-limited job is retried without counting an attempt.
+        """
+        attempts = self.connection.execute("SELECT attempts FROM jobs WHERE source = ? AND name = ?",
+                                           (source, name)).fetchone()[0] + count_attempt
+        status = 'failed' if attempts >= MAX_ATTEMPTS else 'pending'
+        self._set(source, name, status=status, attempts=attempts, not_before=time.time() + delay, error=error)
+
+    def _set(self, source, name, **fields):
+        fields['updated_at'] = time.time()
+        assignments = ', '.join(f"{field} = ?" for field in fields)
+        self.connection.execute(f"UPDATE jobs SET {assignments} WHERE source = ? AND name = ?",
+                                (*fields.values(), source, name))
+        self.connection.commit()
+
+    def counts(self, source):
+        """
+        Returns:
+            dict: Number of jobs of the source by status.
+        """
+        return dict(self.connection.execute("SELECT status, COUNT(*) FROM jobs WHERE source = ? GROUP BY status",
+                                            (source,)).fetchall())
+
+    def close(self):
+        self.connection.close()
+
+
+class HostRateLimiter:
+    """
+    Spaces the requests to each host by a minimum interval and pauses a host after a 429, for the Retry-After
+    delay or for a delay that doubles with every consecutive 429 of the host.
+    """
+
+    def __init__(self):
+        self._next = {}
+        self._locks = {}
+        self._strikes = {}
+
+    async def wait(self, host, interval):
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            delay = self._next.get(host, 0.0) - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next[host] = time.monotonic() + interval
+
+    def backoff(self, host, retry_after=None):
+        strikes = self._strikes.get(host, 0)
+        self._strikes[host] = strikes + 1
+        delay = retry_after or min(BACKOFF * 2 ** strikes, MAX_BACKOFF)
+        self._next[host] = max(self._next.get(host, 0.0), time.monotonic() + delay)
+        return delay
+
+    def success(self, host):
+        self._strikes.pop(host, None)
+
+
+def _update(source, pool, company_doc):
+    if pool is None:
+        return source.update(company_doc)
+    with pool.lease() as driver:
+        return source.update(company_doc, driver=driver)
+
+
+def _complete_flushed(queue, written):
+    """
+    Marks done the scraped jobs whose updates are flushed; the others stay running until a later flush.
+
+    Args:
+        queue (JobQueue): The job queue.
+        written (list): (source, company name, `connector.writer.buffered` after the job) of the scraped jobs
+            not marked done yet, updated in place.
+    """
+    flushed = connector.writer.flushed
+    for name, company_name, buffered in written:
+        if buffered <= flushed:
+            queue.complete(name, company_name)
+    written[:] = [job for job in written if job[2] > flushed]
+
+
+async def _worker(name, source, queue, limiter, pool, written):
+    while True:
+        status, job = queue.claim(name)
+        if status == 'empty':
+            return
+        if status == 'wait':
+            await asyncio.sleep(min(job, 5.0))
+            continue
+
+        company_doc = job
+
+        await limiter.wait(source.host, source.interval)
+        try:
+            await asyncio.to_thread(_update, source, pool, company_doc)
+        except RateLimitError as e:
+            delay = limiter.backoff(source.host, e.retry_after)
+            print(f"{name}: rate limited, pausing {source.host} for {delay:.0f}s")
+            queue.retry(name, company_doc['name'], delay, str(e), count_attempt=False)
+        except Exception as e:
+            print(f"{name}: {company_doc['name']} failed - {e!r}")
+            queue.retry(name, company_doc['name'], BACKOFF, repr(e))
+        else:
+            limiter.success(source.host)
+            written.append((name, company_doc['name'], connector.writer.buffered))
+            _complete_flushed(queue, written)
+
+
+async def _run(names, queue, written):
+    limiter = HostRateLimiter()
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=sum(SOURCES[name].concurrency for name in names)))
+
+    pools = {name: BrowserPool(size=SOURCES[name].concurrency, max_uses=BROWSER_MAX_USES,
+                               warm_up=SOURCES[name].warm_up)
+             for name in names if SOURCES[name].warm_up is not None}
+    try:
+        workers = [_worker(name, SOURCES[name], queue, limiter, pools.get(name), written)
+                   for name in names for _ in range(SOURCES[name].concurrency)]
+        await asyncio.gather(*workers)
+    finally:
+        for pool in pools.values():
+            pool.close()
+
+
+def run(names=None, queue_path=QUEUE_PATH, refresh=True):
+    """
+    Scrapes the companies missing the esg_company_data of each source, concurrently.
+
+    Args:
+        names (list, optional): Names of the sources to run, keys of `SOURCES`. Defaults to all of them.
+        queue_path (str, optional): SQLite file of the job queue. Defaults to `QUEUE_PATH`.
+        refresh (bool, optional): If True, the companies still missing the esg_company_data are queued first;
+            otherwise only the jobs already in the queue are run.
+
+    Returns:
+        dict: Source name mapped to its number of jobs by status.
+    """
+    names = list(names or SOURCES)
+    queue = JobQueue(queue_path)
+    try:
+        if refresh:
+            for name in names:
+                added = queue.enqueue(name, connector.companies.find(SOURCES[name].query, {'name': 1, 'ticker': 1}))
+                print(f"{name}: {added} companies queued")
+
+        written = []
+        try:
+            asyncio.run(_run(names, queue, written))
+        finally:
+            connector.writer.flush()
+            _complete_flushed(queue, written)
+
+        counts = {name: queue.counts(name) for name in names}
+        for name, count in counts.items():
+            print(f"{name}: {count}")
+        print_timing_profile()
+        return counts
+    finally:
+        queue.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the scrapers concurrently.')
+    parser.add_argument('sources', nargs='*', choices=list(SOURCES), help='sources to run, all if none is given')
+    parser.add_argument('--db', default=QUEUE_PATH, help='SQLite file of the job queue')
+    parser.add_argument('--resume', action='store_true', help='only run the jobs already in the queue')
+    args = parser.parse_args()
+
+    run(args.sources, queue_path=args.db, refresh=not args.resume)
@@ -1,6 +1,6 @@
-import time
-import requests
 from bs4 import BeautifulSoup
+from scraping.http_client import client
+from scraping.exceptions import RateLimitError, retry_after_seconds
 from utils import connector
 import re
 
@@ -17,9 +17,7 @@ def get_score(ticker):
     """
 
     search_url = f"https://stockanalysis.com/stocks/{ticker}/statistics/"
-    # headers = {"User-Agent": "Mozilla/5.0"}
-    # response = requests.get(search_url, headers=headers)
-    response = requests.get(search_url, headers={
+    response = client.get(search_url, headers={
         'User-agent': 'Mozilla/5.0 (Windows NT 6.1; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
                       'Chrome/64.0.3282.186 Safari/537.36'})
 
@@ -56,8 +54,8 @@ def get_score(ticker):
         else:
             print(f"{ticker} - Status code:{response.status_code}")
             if response.status_code == 429:
-                time.sleep(60)
-                update_all_companies_score()
+                raise RateLimitError(search_url, retry_after_seconds(response))
+            response.raise_for_status()
 
 
 def add_one_score_to_mongodb(company_name, alt, pio):
@@ -69,16 +67,7 @@ def add_one_score_to_mongodb(company_name, alt, pio):
         alt (str): Altman Z-Score.
         pio (str): Piotroski F-Score.
     """
-    query = {"name": company_name}
-    existing_entry = connector.companies.find_one(query)
-    if existing_entry and 'altman_score' not in existing_entry and 'piotroski_score' not in existing_entry:
-        new_values = {
-            "$set": {
-                "altman_score": alt,
-                'piotroski_score': pio
-            }
-        }
-        connector.companies.update_one(query, new_values)
+    connector.writer.set_missing(company_name, {"altman_score": alt, 'piotroski_score': pio}, together=True)
 
 
 def update_all_companies_score():
@@ -89,11 +78,20 @@ def update_all_companies_score():
      esg_company_data in the MongoDB database.
      """
 
-    for company_doc in connector.companies.find({"altman_score": {"$exists": False}, "pio_score": {"$exists": False}}):
-        if company_doc['ticker'] != 'null':
-            alt, pio = get_score(ticker=company_doc['ticker'])
-            if pio != 'null':
-                pio = int(pio)
-            if alt != 'null':
-                alt = float(alt)
-            add_one_score_to_mongodb(company_name=company_doc['name'], alt=alt, pio=pio)
+    from scraping.orchestrator import run
+    run(['altman_piotroski'])
+
+
+def update_company(company_doc):
+    """
+    Scrapes and stores the Altman Z-Score and Piotroski F-Score of one company.
+
+    Args:
+        company_doc (dict): The company, with its name and ticker.
+    """
+    alt, pio = get_score(ticker=company_doc['ticker'])
+    if pio != 'null':
+        pio = int(pio)
+    if alt != 'null':
+        alt = float(alt)
+    add_one_score_to_mongodb(company_name=company_doc['name'], alt=alt, pio=pio)
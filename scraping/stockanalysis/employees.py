@@ -1,6 +1,6 @@
-import time
-import requests
 from bs4 import BeautifulSoup
+from scraping.http_client import client
+from scraping.exceptions import RateLimitError, retry_after_seconds
 from utils import connector
 import re
 
@@ -17,8 +17,8 @@ def get_employees(ticker):
     """
 
     search_url = f"https://stockanalysis.com/stocks/{ticker}/company/"
-    response = requests.get(search_url, headers={"User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; "
-                                                               "rv:96.0) Gecko/20100101 Firefox/96.0"})
+    response = client.get(search_url, headers={"User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; "
+                                                             "rv:96.0) Gecko/20100101 Firefox/96.0"})
 
     if response.status_code == 200:
         soup = BeautifulSoup(response.text, "html.parser")
@@ -38,8 +38,8 @@ def get_employees(ticker):
         else:
             print(f"{ticker} - Status code:{response.status_code}")
             if response.status_code == 429:
-                time.sleep(60)
-                update_all_companies_employees()
+                raise RateLimitError(search_url, retry_after_seconds(response))
+            response.raise_for_status()
 
 
 def add_one_employees_to_mongodb(company_name, employees):
@@ -51,15 +51,7 @@ def add_one_employees_to_mongodb(company_name, employees):
         employees (str): Number of employees.
     """
 
-    query = {"name": company_name}
-    existing_entry = connector.companies.find_one(query)
-    if existing_entry and 'employees' not in existing_entry:
-        new_values = {
-            "$set": {
-                "employees": employees,
-            }
-        }
-        connector.companies.update_one(query, new_values)
+    connector.writer.set_missing(company_name, {"employees": employees})
 
 
 def update_all_companies_employees():
@@ -70,9 +62,18 @@ def update_all_companies_employees():
     esg_company_data in the MongoDB database.
     """
 
-    for company_doc in connector.companies.find({"employees": {"$exists": False}}):
-        if company_doc['ticker'] != 'null':
-            employees = get_employees(ticker=company_doc['ticker'])
-            if employees != 'null':
-                employees = int(employees.replace(',', ''))
-            add_one_employees_to_mongodb(company_name=company_doc['name'], employees=employees)
+    from scraping.orchestrator import run
+    run(['employees'])
+
+
+def update_company(company_doc):
+    """
+    Scrapes and stores the number of employees of one company.
+
+    Args:
+        company_doc (dict): The company, with its name and ticker.
+    """
+    employees = get_employees(ticker=company_doc['ticker'])
+    if employees != 'null':
+        employees = int(employees.replace(',', ''))
+    add_one_employees_to_mongodb(company_name=company_doc['name'], employees=employees)
@@ -0,0 +1,160 @@
+"""
+Module to scrape the number of employees, the Altman Z-Score and the Piotroski F-Score of a company from
+StockAnalysis.com in one pass.
+
+Only the pages of the fields the company is missing are fetched, one after the other: the company page for the
+employees and the statistics page for the two scores. They are parsed with lxml and searched by their labels
+instead of the Tailwind classes of the page, then the fields are written through the batched writer.
+
+Functions:
+    get_fundamentals(ticker: str, fields: tuple) -> dict
+        Scrapes the employees, Altman Z-Score and Piotroski F-Score of a ticker.
+
+    missing_fields(company_name: str) -> tuple
+        Returns the fields the company does not have yet.
+
+    add_to_mongodb(company_name: str, fundamentals: dict) -> None
+        Sets the fields the company does not have yet.
+
+    update_company(company_doc: dict) -> None
+        Scrapes and stores the fundamentals of one company.
+
+    update_all_companies() -> None
+        Updates all companies missing one of the fields.
+"""
+
+import re
+
+import lxml.html
+
+from scraping.exceptions import RateLimitError, retry_after_seconds
+from scraping.http_client import client
+from utils import connector
+
+STATISTICS_URL = "https://stockanalysis.com/stocks/{ticker}/statistics/"
+COMPANY_URL = "https://stockanalysis.com/stocks/{ticker}/company/"
+HEADERS = {"User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:96.0) Gecko/20100101 Firefox/96.0"}
+
+ALTMAN = re.compile(r"Altman Z-Score(?: of)?\s+(-?[\d,]*\.?\d+|n/a)")
+PIOTROSKI = re.compile(r"Piotroski F-Score(?: of)?\s+(\d+|n/a)")
+EMPLOYEES = re.compile(r"\bEmployees\s+(\d[\d,]*)\b")
+
+FIELDS = ('employees', 'altman_score', 'piotroski_score')
+SCORES = ('altman_score', 'piotroski_score')
+
+
+def fetch_page(url):
+    """
+    Fetches a page of StockAnalysis.com.
+
+    Args:
+        url (str): The URL.
+
+    Returns:
+        str: The HTML, or None if the page does not exist.
+
+    Raises:
+        RateLimitError: If the site answers 429.
+    """
+    response = client.get(url, headers=HEADERS)
+
+    if response.status_code == 404:
+        return None
+    if response.status_code == 429:
+        raise RateLimitError(url, retry_after_seconds(response))
+    response.raise_for_status()
+    return response.text
+
+
+def page_text(html):
+    """
+    Extracts the visible text of a page, one space between the text nodes.
+
+    Args:
+        html (str): The HTML.
+
+    Returns:
+        str: The text, without scripts and styles.
+    """
+    tree = lxml.html.fromstring(html)
+    for element in tree.xpath('//script|//style'):
+        element.drop_tree()
+    return ' '.join(text.strip() for text in tree.itertext() if text.strip())
+
+
+def _match(pattern, text, convert):
+    match = pattern.search(text) if text else None
+    if match is None or match.group(1) == 'n/a':
+        return 'null'
+    try:
+        return convert(match.group(1).replace(',', ''))
+    except ValueError:
+        return 'null'
+
+
+def get_fundamentals(ticker, fields=FIELDS):
+    """
+    Scrapes the number of employees, the Altman Z-Score and the Piotroski F-Score of a ticker. The pages are
+    fetched sequentially, so that a job of the orchestrator sends one request at a time to the host.
+
+    Args:
+        ticker (str): The stock ticker symbol.
+        fields (tuple, optional): The fields to scrape; a page is only fetched if one of its fields is asked.
+            Defaults to `FIELDS`.
+
+    Returns:
+        dict: The asked fields among employees (int), altman_score (float) and piotroski_score (int), 'null'
+            when not found.
+    """
+    fundamentals = {}
+    if 'employees' in fields:
+        company = fetch_page(COMPANY_URL.format(ticker=ticker))
+        fundamentals['employees'] = _match(EMPLOYEES, page_text(company) if company else None, int)
+    if any(field in fields for field in SCORES):
+        statistics = fetch_page(STATISTICS_URL.format(ticker=ticker))
+        statistics = page_text(statistics) if statistics else None
+        fundamentals['altman_score'] = _match(ALTMAN, statistics, float)
+        fundamentals['piotroski_score'] = _match(PIOTROSKI, statistics, int)
+    print(f"{ticker} - {fundamentals}")
+    return fundamentals
+
+
+def missing_fields(company_name):
+    """
+    Returns:
+        tuple: The fields of `FIELDS` the company does not have yet.
+    """
+    company = connector.companies.find_one({"name": company_name}, {field: 1 for field in FIELDS}) or {}
+    return tuple(field for field in FIELDS if field not in company)
+
+
+def add_to_mongodb(company_name, fundamentals):
+    """
+    Sets the fields the company does not have yet, each one filtered on `$exists` like the single scrapers.
+
+    Args:
+        company_name (str): The name of the company.
+        fundamentals (dict): The scraped fields.
+    """
+    connector.writer.set_missing(company_name, fundamentals)
+
+
+def update_company(company_doc):
+    """
+    Scrapes and stores the fundamentals the company is missing; a company that has them all is skipped.
+
+    Args:
+        company_doc (dict): The company, with its name and ticker.
+    """
+    fields = missing_fields(company_doc['name'])
+    if fields:
+        fundamentals = get_fundamentals(company_doc['ticker'], fields)
+        add_to_mongodb(company_doc['name'], {field: fundamentals[field] for field in fields})
+
+
+def update_all_companies():
+    """
+    Updates all companies in the database missing the employees, the Altman Z-Score or the Piotroski F-Score.
+    """
+    from scraping.orchestrator import run
+    run(['stockanalysis'])
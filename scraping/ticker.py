@@ -1,5 +1,6 @@
-import requests
 from bs4 import BeautifulSoup
+from scraping.http_client import client
+from scraping.exceptions import RateLimitError, retry_after_seconds
 from utils import connector
 
 
@@ -16,7 +17,7 @@ def get_ticker(company_name):
 
     try:
         search_url = f"https://www.investing.com/search/?q={company_name}"
-        response = requests.get(search_url)
+        response = client.get(search_url)
 
         if response.status_code == 200:
             soup = BeautifulSoup(response.text, "html.parser")
@@ -29,6 +30,8 @@ def get_ticker(company_name):
             return ticker
         else:
             print("Error code: ", response.status_code)
+            if response.status_code == 429:
+                raise RateLimitError(search_url, retry_after_seconds(response))
     except AttributeError:
         print('No ticker found for ', company_name)
         return "null"
@@ -42,12 +45,8 @@ def add_one_ticker_to_mongodb(company_name, ticker):
         company_name (str): The name of the company.
         ticker (str): Stock ticker symbol.
     """
-    
-    query = {"name": company_name}
-    existing_entry = connector.companies.find_one(query)
-    if existing_entry and 'ticker' not in existing_entry:
-        new_values = {"$set": {"ticker": ticker}}
-        connector.companies.update_one(query, new_values)
+
+    connector.writer.set_missing(company_name, {"ticker": ticker})
 
 
 def update_all_companies_tickers():
@@ -58,9 +57,19 @@ def update_all_companies_tickers():
     esg_company_data in the MongoDB database.
     """
 
-    for company_doc in connector.companies.find({"ticker": {"$exists": False}}):
-        ticker = get_ticker(company_doc["name"])
-
-        if ticker:
-            add_one_ticker_to_mongodb(company_doc["name"], ticker)
+    from scraping.orchestrator import run
+    run(['tickers'])
     print('Done')
+
+
+def update_company(company_doc):
+    """
+    Searches and stores the stock ticker symbol of one company.
+
+    Args:
+        company_doc (dict): The company, with its name.
+    """
+    ticker = get_ticker(company_doc["name"])
+
+    if ticker:
+        add_one_ticker_to_mongodb(company_doc["name"], ticker)
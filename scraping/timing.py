@@ -0,0 +1,69 @@
+"""
+Per-step timings of the scrapers.
+
+Every scraper times the steps of each company (page load, search, each section of the page) with a
+`StepTimer`. The durations are aggregated by source and step, so that a run can report where the time goes
+and the wait timeouts of each source can be set from the observed durations.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+_durations = {}
+_lock = threading.Lock()
+
+
+class StepTimer:
+    """
+    Records the wall time of the named steps of scraping one company.
+    """
+
+    def __init__(self, source):
+        """
+        Args:
+            source (str): The name of the source, e.g. 'msci'.
+        """
+        self.source = source
+        self.steps = {}
+
+    @contextmanager
+    def step(self, name):
+        """
+        Times the block as the step `name`, including when it raises.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            self.steps[name] = self.steps.get(name, 0.0) + duration
+            with _lock:
+                _durations.setdefault((self.source, name), []).append(duration)
+
+
+def timing_profile():
+    """
+    Summarizes the recorded durations.
+
+    Returns:
+        dict: (source, step) mapped to the count, mean, 95th percentile and max duration in seconds.
+    """
+    with _lock:
+        durations = {key: np.array(values) for key, values in _durations.items()}
+    return {key: {'count': len(values), 'mean': float(values.mean()), 'p95': float(np.percentile(values, 95)),
+                  'max': float(values.max())}
+            for key, values in durations.items()}
+
+
+def print_timing_profile():
+    for (source, step), stats in sorted(timing_profile().items()):
+        print(f"{source:<16} {step:<14} n={stats['count']:<5} mean={stats['mean']:.2f}s "
+              f"p95={stats['p95']:.2f}s max={stats['max']:.2f}s")
+
+
+def reset_timing_profile():
+    with _lock:
+        _durations.clear()
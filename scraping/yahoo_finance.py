@@ -1,50 +1,83 @@
 from utils import connector
-from selenium import webdriver
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.action_chains import ActionChains
+from selenium.webdriver.support import expected_conditions as EC
+from scraping.browser import accept_cookies, new_driver, wait_until
+from scraping.timing import StepTimer
 
+YAHOO_URL = "https://finance.yahoo.com/"
+COOKIES_BUTTON = 'scroll-down-btn'
 
-def scrape_yf(ticker):
+# seconds to wait for the product involvement section, which is rendered after the page load
+SECTION_TIMEOUT = 5
+
+
+def accept_consent(driver):
+    """
+    Accepts the Yahoo consent page if it is shown.
+
+    Args:
+        driver (webdriver.Chrome): The driver.
+    """
+    if accept_cookies(driver, COOKIES_BUTTON):
+        action = ActionChains(driver)
+        for _ in range(6):
+            action.send_keys(Keys.TAB).perform()
+
+        action.send_keys(Keys.ENTER).perform()
+
+
+def warm_up(driver):
+    """
+    Opens Yahoo Finance and accepts its consent page, for a driver of the browser pool.
+
+    Args:
+        driver (webdriver.Chrome): The new driver.
+    """
+    driver.get(YAHOO_URL)
+    accept_consent(driver)
+
+
+def scrape_yf(ticker, driver=None):
     """
     Retrieves product involvement areas for a given stock ticker from Yahoo Finance.
 
     Args:
         ticker (str): The stock ticker symbol.
+        driver (webdriver.Chrome, optional): A driver leased from a browser pool. If None, a new browser is
+            started and quit once done.
 
     Returns:
         dict: Product involvement areas.
     """
+    if driver is None:
+        driver = new_driver()
+        try:
+            return scrape_yf(ticker, driver)
+        finally:
+            driver.quit()
+
     involvement_dict = {}
     url = f"https://finance.yahoo.com/quote/{ticker}/sustainability"
     eq_url = f"https://finance.yahoo.com/quote/{ticker}/sustainability?guccounter=1"
 
-    # browser options
-    options = Options()
-    options.add_argument("--headless")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-
-    # initialize the webdriver
-    driver = webdriver.Chrome(options=options)
-
-    driver.get(url)
-    action = ActionChains(driver)
+    timer = StepTimer('yahoo_finance')
 
-    # accept cookie
-    cookies_button = driver.find_element(By.ID, 'scroll-down-btn')
-    cookies_button.click()
+    with timer.step('load'):
+        driver.get(url)
 
-    for _ in range(6):
-        action.send_keys(Keys.TAB).perform()
+        # accept cookie
+        accept_consent(driver)
 
-    action.send_keys(Keys.ENTER).perform()
-
-    if driver.current_url != eq_url:
+    # the consent page redirects to eq_url, a warm driver lands on url directly
+    if driver.current_url not in (url, eq_url):
         print(f'{ticker}: !eq {driver.current_url}')
         return 'null'
 
+    with timer.step('involvement'):
+        wait_until(driver, EC.presence_of_element_located((By.CLASS_NAME, "svelte-jjhdng")), SECTION_TIMEOUT)
+
     try:
         involvement = driver.find_elements(By.CLASS_NAME, "svelte-jjhdng")[0].text
     except IndexError as e:
@@ -74,12 +107,7 @@ def add_involvement_to_mongodb(company_name, involvement_dict):
         involvement_dict (dict): Product involvement areas.
     """
 
-    query = {"name": company_name}
-    existing_entry = connector.companies.find_one(query)
-
-    if existing_entry and 'involvement' not in existing_entry:
-        new_values = {"$set": {"involvement": involvement_dict}}
-        connector.companies.update_one(query, new_values)
+    connector.writer.set_missing(company_name, {"involvement": involvement_dict})
 
 
 def update_all_companies_involvements():
@@ -90,6 +118,16 @@ def update_all_companies_involvements():
     esg_company_data in the MongoDB database.
     """
 
-    for company_doc in connector.companies.find({"involvement": {"$exists": False}, "ticker": {"$exists": True}}):
-        if company_doc['ticker'] != 'null':
-            add_involvement_to_mongodb(company_doc['name'], scrape_yf(company_doc['ticker']))
+    from scraping.orchestrator import run
+    run(['yahoo_finance'])
+
+
+def update_company(company_doc, driver=None):
+    """
+    Scrapes and stores the product involvement areas of one company.
+
+    Args:
+        company_doc (dict): The company, with its name and ticker.
+        driver (webdriver.Chrome, optional): A driver leased from a browser pool.
+    """
+    add_involvement_to_mongodb(company_doc['name'], scrape_yf(company_doc['ticker'], driver=driver))
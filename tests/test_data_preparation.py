@@ -0,0 +1,69 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_preparation.benchmark import (encodings_chained_replace, encodings_compiled, merge_by_esg_per_metric,
+                                        merge_involvement_rowwise)
+from data_preparation.cleaning import INVOLVEMENT_GROUPS, merge_involvement
+from data_preparation.encoding import ENCODINGS
+from data_preparation.metrics import METRIC_WEIGHTS_PATH, load_metric_weights, merge_by_esg
+
+RAW_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'raw.csv')
+
+
+@pytest.fixture(scope='module')
+def raw():
+    return pd.read_csv(RAW_PATH, low_memory=False)
+
+
+def test_merge_involvement_matches_rowwise(raw):
+    expected = merge_involvement_rowwise(raw.copy())[list(INVOLVEMENT_GROUPS)]
+    actual = merge_involvement(raw.copy())[list(INVOLVEMENT_GROUPS)]
+
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_merge_involvement_without_some_source_columns(raw):
+    partial = raw.drop(columns=['involvement_msci_Gambling', 'involvement_Palm Oil'])
+
+    expected = merge_involvement_rowwise(partial.copy())[list(INVOLVEMENT_GROUPS)]
+    actual = merge_involvement(partial.copy())[list(INVOLVEMENT_GROUPS)]
+
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_compiled_encodings_match_chained_replace(raw):
+    merged = merge_involvement(raw.copy())
+    columns = [col for spec in ENCODINGS.values() for col in spec['columns'] if col in merged.columns]
+
+    expected = encodings_chained_replace(merged.copy())[columns].astype(object)
+    actual = encodings_compiled(merged.copy())[columns].astype(object)
+
+    assert ((expected == actual) | (expected.isna() & actual.isna())).all().all()
+
+
+def test_merge_by_esg_matches_per_metric_sums(raw):
+    encoded = encodings_compiled(merge_involvement(raw.copy()))
+    _, columns, _, _ = load_metric_weights()
+    encoded[columns] = encoded[columns].apply(pd.to_numeric, errors='coerce')
+
+    pd.testing.assert_frame_equal(merge_by_esg(encoded.copy()), merge_by_esg_per_metric(encoded.copy()))
+
+
+def test_merge_by_esg_propagates_nan_of_zero_weight_columns(tmp_path, monkeypatch):
+    with open(METRIC_WEIGHTS_PATH) as f:
+        weights = json.load(f)
+    weights['environmental_metric']['extra'] = 0.0
+    weights_path = tmp_path / 'metric_weights.json'
+    weights_path.write_text(json.dumps(weights))
+
+    columns = list(dict.fromkeys(col for metric in weights.values() for col in metric))
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.random((200, len(columns))), columns=columns)
+    df = df.mask(rng.random(df.shape) < 0.05)
+
+    monkeypatch.setattr('data_preparation.benchmark.METRIC_WEIGHTS_PATH', str(weights_path))
+    pd.testing.assert_frame_equal(merge_by_esg(df.copy(), str(weights_path)), merge_by_esg_per_metric(df.copy()))
@@ -0,0 +1,40 @@
+from utils.name_index import NameIndex
+
+
+def make_index():
+    names = ['IBM', 'Dell', 'DELL', 'Delp', 'Microsoft', 'Oracle', 'EMCOR', 'EMC', 'Informa', 'Informatica']
+    tickers = ['IBM', 'DELL', None, 'DLP', 'MSFT', 'ORCL', 'EME', None, 'INF', None]
+    scored = [True, True, True, True, True, True, True, False, True, False]
+    return NameIndex(names, tickers, scored)
+
+
+def test_short_name_typos_resolve():
+    index = make_index()
+
+    assert index.resolve('IBMM') == 'IBM'
+    assert index.resolve('Oracel') == 'Oracle'
+    assert index.resolve('Microsft') == 'Microsoft'
+
+
+def test_ties_are_broken_by_links():
+    index = make_index()
+
+    # 'Dell' and 'Delp' are as close to 'Del'
+    assert index.resolve('Del') is None
+    assert index.resolve('Del', links={'Dell': 73, 'DELL': 1}) == 'Dell'
+    assert index.resolve('Del', links={'Dell': 5, 'Delp': 5}) is None
+
+
+def test_known_companies_are_not_remapped():
+    index = make_index()
+
+    assert index.resolve('EMC') is None
+    assert index.resolve('informatica') is None
+    assert index.resolve('msft') == 'Microsoft'
+
+
+def test_unrelated_names_stay_unresolved():
+    index = make_index()
+
+    assert index.resolve('Acme') is None
+    assert index.resolve('ABC') is None
@@ -0,0 +1,61 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from esg_company_data.scoring import FEATURE_ORDER, predict_payloads
+
+RAW_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'raw.csv')
+
+
+class WeightedSumModel:
+    """
+    Deterministic stand-in for the company-data model, sensitive to the value and the position of every feature.
+    """
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=float)
+        return np.nan_to_num(X) @ np.arange(1, len(FEATURE_ORDER) + 1)
+
+
+@pytest.fixture(scope='module')
+def payloads():
+    df = pd.read_csv(RAW_PATH, low_memory=False).head(200)
+    records = [{key: value for key, value in record.items() if not pd.isna(value)}
+               for record in df.to_dict(orient='records')]
+
+    # only the payloads that can be scored on their own
+    scorable = []
+    for record in records:
+        try:
+            predict_payloads(WeightedSumModel(), [record])
+        except KeyError:
+            continue
+        scorable.append(record)
+    return scorable
+
+
+def test_batch_equals_single_predictions(payloads):
+    model = WeightedSumModel()
+    single = [predict_payloads(model, [payload])[0] for payload in payloads]
+
+    assert len({tuple(payload) for payload in payloads}) > 1
+    np.testing.assert_array_equal(predict_payloads(model, payloads), single)
+
+
+def test_value_types_do_not_leak_across_a_batch(payloads):
+    model = WeightedSumModel()
+    payload = next(payload for payload in payloads if 'Decarbonization Target_Comprehensiveness' in payload)
+    numeric = {**payload, 'Decarbonization Target_Comprehensiveness': 50.0}
+
+    # a number where the preprocessing expects a string fails on its own, so it fails in a batch too
+    with pytest.raises(AttributeError):
+        predict_payloads(model, [numeric])
+    with pytest.raises(AttributeError):
+        predict_payloads(model, [payload, numeric])
+
+    other = next(other for other in payloads
+                 if other is not payload and 'Decarbonization Target_Comprehensiveness' in other)
+    np.testing.assert_array_equal(predict_payloads(model, [payload, other]),
+                                  [predict_payloads(model, [payload])[0], predict_payloads(model, [other])[0]])
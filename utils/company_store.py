@@ -0,0 +1,142 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.datasets import load_dataset
+
+
+def normalize_name(name):
+    """
+    Normalizes a company name or ticker so that lookups ignore case and redundant whitespace.
+
+    Args:
+        name (str): The company name or ticker.
+
+    Returns:
+        str: The normalized key, or an empty string if `name` is missing.
+    """
+    if not isinstance(name, str):
+        return ''
+    return ' '.join(name.split()).casefold()
+
+
+class CompanyStore:
+    """
+    In-memory reference table of the companies in label_with_metrics.csv.
+
+    The CSV is parsed once and indexed by normalized name and ticker, so resolving the ESG score or the metric
+    columns of many companies costs a single vectorized index lookup instead of a file read per company.
+    The file is re-read transparently when its modification time changes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._state = None
+        self._load()
+
+    def _load(self):
+        mtime = os.path.getmtime(self.path)
+        df = load_dataset(self.path)
+
+        # names take precedence over tickers when the same key appears in both columns
+        keys = pd.concat([df['name'].map(normalize_name), df['ticker'].map(normalize_name)], ignore_index=True)
+        positions = np.concatenate([np.arange(len(df)), np.arange(len(df))])
+        keep = (keys != '') & ~keys.duplicated()
+
+        # swapped as a single reference so that concurrent readers never see a half-built index
+        self._state = (df.reset_index(drop=True), pd.Index(keys[keep].to_numpy()), positions[keep.to_numpy()])
+        self._mtime = mtime
+
+    def _refresh(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except FileNotFoundError:
+            return
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self._load()
+
+    @property
+    def df(self):
+        """
+        Returns:
+            pd.DataFrame: The current reference table.
+        """
+        self._refresh()
+        return self._state[0]
+
+    @property
+    def version(self):
+        """
+        Returns:
+            float: Modification time of the file the current reference table was read from.
+        """
+        self._refresh()
+        return self._mtime
+
+    def positions(self, names):
+        """
+        Resolves company names or tickers to row positions of the reference table.
+
+        Args:
+            names (list): Company names or tickers.
+
+        Returns:
+            np.ndarray: Row position for each name, -1 where the company is unknown.
+        """
+        return self._resolve(names)[1]
+
+    def _resolve(self, names):
+        self._refresh()
+        df, index, positions = self._state
+        found = index.get_indexer([normalize_name(name) for name in names])
+        return df, np.where(found >= 0, positions[found], -1)
+
+    def lookup(self, names, columns=None):
+        """
+        Returns the reference rows of many companies in one lookup.
+
+        Args:
+            names (list): Company names or tickers.
+            columns (list, optional): Columns to return. Defaults to all the columns.
+
+        Returns:
+            pd.DataFrame: One row per requested name, in the same order, with NaN for unknown companies.
+        """
+        df, pos = self._resolve(names)
+        if columns is not None:
+            df = df[columns]
+        rows = df.reindex(pos)
+        rows.index = list(names)
+        return rows
+
+    def esg_values(self, names):
+        """
+        Returns the ESG score of many companies in one lookup.
+
+        Args:
+            names (list): Company names or tickers.
+
+        Returns:
+            list: The ESG score for each name, or None where the company is unknown.
+        """
+        df, pos = self._resolve(names)
+        esg = df['esg'].to_numpy()
+        return [esg[p].item() if p >= 0 else None for p in pos]
+
+    def get_esg(self, name):
+        """
+        Returns the ESG score of a single company.
+
+        Args:
+            name (str): Company name or ticker.
+
+        Returns:
+            float: The ESG score, or None if the company is unknown.
+        """
+        return self.esg_values([name])[0]
@@ -1,81 +1,245 @@
-import pymongo
+"""
+Connection to the MongoDB database of the companies and their links.
+
+Nothing connects at import time: the client is created on first use, configured from the environment:
+
+    MONGO_URI          the connection string, defaults to mongodb://localhost:27017/
+    MONGO_DB           the database name, defaults to jala_svn
+    MONGO_POOL_SIZE    the maximum number of pooled connections, defaults to 10
+    MONGO_TIMEOUT_MS   the server selection and connect timeout in milliseconds, defaults to 5000
 
-client = pymongo.MongoClient("mongodb://localhost:27017/")
-database = client["jala_svn"]
+`connector.companies`, `connector.links` and `connector.writer` still work, resolved lazily by the module
+`__getattr__`.
+"""
+
+import os
+import threading
+
+import pymongo
+from pymongo import UpdateOne
 
-companies = database["companies"]
-links = database["links"]
+MONGO_URI = os.environ.get('MONGO_URI', 'mongodb://localhost:27017/')
+MONGO_DB = os.environ.get('MONGO_DB', 'jala_svn')
+MONGO_POOL_SIZE = int(os.environ.get('MONGO_POOL_SIZE', 10))
+MONGO_TIMEOUT_MS = int(os.environ.get('MONGO_TIMEOUT_MS', 5000))
 
-all_companies_with_ticker = companies.find({'$and': [
+WITH_TICKER = {'$and': [
     {'ticker': {'$exists': True}},
     {'ticker': {'$ne': 'null'}}
-]})
+]}
+
+_client = None
+_client_lock = threading.RLock()
+
+
+def get_client():
+    """
+    Returns the shared client, created on the first call. The client connects on its first operation.
+
+    Returns:
+        pymongo.MongoClient: The client, with its connection pool.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = pymongo.MongoClient(MONGO_URI, connect=False, maxPoolSize=MONGO_POOL_SIZE,
+                                          serverSelectionTimeoutMS=MONGO_TIMEOUT_MS,
+                                          connectTimeoutMS=MONGO_TIMEOUT_MS)
+        return _client
+
+
+def get_collection(name):
+    """
+    Args:
+        name (str): The collection name, e.g. 'companies'.
+
+    Returns:
+        pymongo.collection.Collection: The collection of the configured database.
+    """
+    return get_client()[MONGO_DB][name]
+
+
+def companies_with_ticker(projection=None):
+    """
+    Queries the companies with a ticker. Every call returns a new cursor, so it can be iterated again.
+
+    Args:
+        projection (dict or list, optional): The fields to return. Defaults to all of them.
+
+    Returns:
+        pymongo.cursor.Cursor: The companies.
+    """
+    return get_collection('companies').find(WITH_TICKER, projection)
+
+
+def __getattr__(name):
+    if name == 'client':
+        return get_client()
+    if name == 'database':
+        return get_client()[MONGO_DB]
+    if name in ('companies', 'links'):
+        return get_collection(name)
+    if name == 'all_companies_with_ticker':
+        return companies_with_ticker()
+    if name == 'writer':
+        return _get_writer()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+BATCH_SIZE = 100
+
+
+class BulkWriter:
+    """
+    Buffers the updates of the scrapers and sends them with unordered `bulk_write` calls, one round trip per
+    `batch_size` updates instead of a `find_one` and an `update_one` per company.
+
+    The worker threads of the scraping orchestrator share the writer; `flush` must be called once they are done.
+    `buffered` counts the updates buffered so far and `flushed` how many of them were sent: an update is in the
+    database once `flushed` reaches the value `buffered` had right after it.
+    """
+
+    def __init__(self, collection, batch_size=BATCH_SIZE):
+        """
+        Args:
+            collection (pymongo.collection.Collection): The collection to update.
+            batch_size (int, optional): Number of buffered updates that triggers a flush. Defaults to `BATCH_SIZE`.
+        """
+        self.collection = collection
+        self.batch_size = batch_size
+        self._operations = []
+        self._lock = threading.Lock()
+        # flushes run one at a time, so that `flushed` only grows once the earlier updates are written
+        self._flush_lock = threading.Lock()
+        self.buffered = 0
+        self.flushed = 0
+
+    def update(self, query, update):
+        """
+        Buffers an update of the document matching `query`.
+        """
+        with self._lock:
+            self._operations.append(UpdateOne(query, update))
+            self.buffered += 1
+            full = len(self._operations) >= self.batch_size
+        if full:
+            self.flush()
+
+    def set_missing(self, company_name, fields, together=False):
+        """
+        Sets the fields the company does not have yet. The condition is part of the filter, so nothing is read.
+
+        Args:
+            company_name (str): The name of the company.
+            fields (dict): Field names mapped to their value.
+            together (bool, optional): If True, the fields are only set when all of them are missing; otherwise
+                each field is set on its own when it is missing.
+        """
+        if together:
+            self.update({'name': company_name, **{field: {'$exists': False} for field in fields}}, {'$set': fields})
+            return
+        for field, value in fields.items():
+            self.update({'name': company_name, field: {'$exists': False}}, {'$set': {field: value}})
+
+    def flush(self):
+        """
+        Sends the buffered updates.
+
+        Returns:
+            int: The number of modified documents.
+
+        Raises:
+            pymongo.errors.PyMongoError: If the write fails; the updates stay buffered.
+        """
+        with self._flush_lock:
+            with self._lock:
+                operations, self._operations = self._operations, []
+                buffered = self.buffered
+            if not operations:
+                return 0
+            try:
+                modified = self.collection.bulk_write(operations, ordered=False).modified_count
+            except Exception:
+                # the batch goes back in the buffer, so the next flush sends it again; the scrapers only set
+                # missing fields, so sending again the ones that landed changes nothing
+                with self._lock:
+                    self._operations = operations + self._operations
+                raise
+            self.flushed = buffered
+            return modified
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+
+_writer = None
+
+
+def _get_writer():
+    global _writer
+    with _client_lock:
+        if _writer is None:
+            _writer = BulkWriter(get_collection('companies'))
+        return _writer
 
 
 def clean_employees():
-    documents = companies.find({"employees": {"$exists": True}})
-    for doc in documents:
-        employees_value = doc['employees']
-        try:
-            if isinstance(employees_value, str) and employees_value.replace(',', '').isdigit():
-                update = {
-                    'employees': int(employees_value.replace(',', '')),
-                }
-                companies.update_one(
-                    {'_id': doc['_id']},
-                    {'$set': update}
-                )
-        except ValueError as e:
-            print(f"Errore di conversione per il documento con _id {doc['_id']}: {e}")
+    """
+    Converts the employees stored as strings, e.g. '164,000', to integers on the server.
+    """
+    result = get_collection('companies').update_many(
+        {'employees': {'$type': 'string', '$regex': r'^[0-9,]*[0-9][0-9,]*$'}},
+        [{'$set': {'employees': {'$toInt': {'$replaceAll': {'input': '$employees', 'find': ',', 'replacement': ''}}}}}])
+    print(f"employees: {result.modified_count} converted")
+
+
+def _convert_or_keep(field, to):
+    # the field converted to the type, or unchanged if it is not a number
+    return {'$convert': {'input': f'${field}', 'to': to, 'onError': f'${field}', 'onNull': f'${field}'}}
 
 
 def clean_altman_piotroski_score():
-    documents = companies.find({"altman_score": {"$exists": True}, "piotroski_score": {"$exists": True}})
-
-    for doc in documents:
-        if doc['altman_score'] != 'null' and doc['piotroski_score'] != 'null':
-            updates = {
-                'altman_score': float(doc['altman_score']),
-                'piotroski_score': int(doc['piotroski_score']),
-            }
-            unset_fields = {
-                'update_time': '',
-                'username': ''
-            }
-
-            companies.update_one(
-                {'_id': doc['_id']},
-                {
-                    '$set': updates,
-                    '$unset': unset_fields
-                }
-            )
+    """
+    Converts the Altman Z-Score to float and the Piotroski F-Score to int on the server, and removes the
+    update_time and username fields of those companies. A value that cannot be converted is left as it is
+    instead of failing the whole update.
+    """
+    result = get_collection('companies').update_many(
+        {'altman_score': {'$exists': True, '$ne': 'null'}, 'piotroski_score': {'$exists': True, '$ne': 'null'}},
+        [{'$set': {'altman_score': _convert_or_keep('altman_score', 'double'),
+                   'piotroski_score': _convert_or_keep('piotroski_score', 'int')}},
+         {'$unset': ['update_time', 'username']}])
+    print(f"altman_score, piotroski_score: {result.modified_count} converted")
 
 
 def reset_param_from_null(param):
-    documents = companies.find({param: {"$exists": True}})
+    """
+    Removes the field from the companies where it is the string 'null', so that the scrapers retry them.
+    """
+    get_collection('companies').update_many({param: 'null'}, {'$unset': {param: ''}})
+
+
+def reset_params_from_null(params):
+    """
+    Removes the fields that are the string 'null', for all the fields in a single pass over the collection.
 
-    for doc in documents:
-        if doc[param] == 'null':
-            unset_fields = {
-                param: '',
-            }
-            companies.update_one(
-                {'_id': doc['_id']},
-                {
-                    '$unset': unset_fields
-                }
-            )
+    Args:
+        params (list): The field names.
+    """
+    result = get_collection('companies').update_many(
+        {'$or': [{param: 'null'} for param in params]},
+        [{'$set': {param: {'$cond': [{'$eq': [f'${param}', 'null']}, '$$REMOVE', f'${param}']}
+                   for param in params}}])
+    print(f"{result.modified_count} companies reset")
 
 
 def remove_fields():
-    documents = companies.find()
-    for doc in documents:
-        unset_fields = {
-            'update_time': '',
-            'username': ''
-        }
-        companies.update_one({'_id': doc['_id']}, {'$unset': unset_fields})
+    get_collection('companies').update_many(
+        {'$or': [{'update_time': {'$exists': True}}, {'username': {'$exists': True}}]},
+        {'$unset': {'update_time': '', 'username': ''}})
 
 
 if __name__ == '__main__':
@@ -91,9 +255,8 @@ if __name__ == '__main__':
                'Controversies',
                'Decarbonization Target',
                'Temperature Goal',
-               'sdg'
+               'sdg',
                'esg'
                ]
 
-    for col in columns:
-        reset_param_from_null(col)
+    reset_params_from_null(columns)
@@ -0,0 +1,122 @@
+"""
+Columnar cache of the CSV datasets in data/.
+
+`load_dataset` parses a CSV once, with the explicit types of `SCHEMAS`, and stores it as an uncompressed Feather
+file in a `.cache` directory next to it. Later loads read the Feather file instead of parsing and re-inferring
+the types of the CSV. The file is memory-mapped for the read, but the columns are still copied into the pandas
+frame, so a load takes as much memory as before, only less time. The cache is rebuilt when the content hash of
+the CSV or its schema changes; a CSV that is only touched is hashed again but not converted again.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+CACHE_DIR = '.cache'
+
+_METRICS = {column: 'float64' for column in ['altman_score', 'Decarbonization Target_Comprehensiveness',
+                                             'Decarbonization Target_Ambition p.a.', 'Temperature Goal', 'esg',
+                                             'environmental_metric', 'social_metric', 'governance_metric',
+                                             'involvement_metric']}
+_COUNTS = {'employees': 'Int64', 'piotroski_score': 'Int64', 'Decarbonization Target_Target Year': 'Int64'}
+
+# dtypes of the known datasets, by file name; the columns of other files are inferred
+SCHEMAS = {
+    'label_with_metrics.csv': {'name': 'str', 'ticker': 'str', **_COUNTS, **_METRICS},
+    'by_esg.csv': {**_COUNTS, **_METRICS},
+    'filtered_links.csv': {'home_name': 'str', 'link_name': 'str', 'type': 'category'},
+}
+
+
+def content_hash(path):
+    """
+    Hashes the content of a file.
+
+    Args:
+        path (str): The file.
+
+    Returns:
+        str: The hexadecimal BLAKE2 digest.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache_paths(path):
+    directory, name = os.path.split(os.path.abspath(path))
+    stem = os.path.join(directory, CACHE_DIR, os.path.splitext(name)[0])
+    return stem + '.feather', stem + '.json'
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_atomic(path, write):
+    # unique per process and thread, e.g. for the threads of the Flask development server
+    temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    write(temporary)
+    os.replace(temporary, path)
+
+
+def _write_meta(meta_path, meta):
+    def write(target):
+        with open(target, 'w') as file:
+            json.dump(meta, file)
+    _write_atomic(meta_path, write)
+
+
+def _build(path, schema, feather_path, meta_path, meta):
+    df = pd.read_csv(path, dtype=schema or None, low_memory=False)
+    os.makedirs(os.path.dirname(feather_path), exist_ok=True)
+    try:
+        _write_atomic(feather_path, lambda target: feather.write_feather(df, target, compression='uncompressed'))
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        # columns of mixed types cannot be stored: the CSV is read every time
+        print(f"{path} not cached: {e}")
+        return df
+    _write_meta(meta_path, meta)
+    return df
+
+
+def load_dataset(path, columns=None):
+    """
+    Loads a CSV dataset through its columnar cache.
+
+    Args:
+        path (str): The CSV file.
+        columns (list, optional): Columns to load. Defaults to all of them.
+
+    Returns:
+        pd.DataFrame: The dataset, with the dtypes of its schema in `SCHEMAS`.
+    """
+    schema = SCHEMAS.get(os.path.basename(path), {})
+    feather_path, meta_path = _cache_paths(path)
+    stat = os.stat(path)
+    meta = _read_meta(meta_path)
+    schema_key = json.dumps(schema, sort_keys=True)
+
+    fresh = (meta is not None and meta['schema'] == schema_key and os.path.exists(feather_path)
+             and (meta['size'], meta['mtime']) == (stat.st_size, stat.st_mtime))
+    if not fresh:
+        digest = content_hash(path)
+        current = {'hash': digest, 'schema': schema_key, 'size': stat.st_size, 'mtime': stat.st_mtime}
+        if meta is None or (meta['hash'], meta['schema']) != (digest, schema_key) or not os.path.exists(feather_path):
+            df = _build(path, schema, feather_path, meta_path, current)
+            return df if columns is None else df[columns]
+        # same content, only the modification time changed
+        _write_meta(meta_path, current)
+
+    return feather.read_table(feather_path, columns=columns, memory_map=True).to_pandas()
@@ -0,0 +1,168 @@
+import glob
+import hashlib
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import joblib
+
+LoadedModel = namedtuple('LoadedModel', ['model', 'path', 'version', 'mtime', 'loaded_at'])
+
+
+def artifact_version(path):
+    """
+    Computes a version identifier from the content of a model artifact.
+
+    Args:
+        path (str): Path of the artifact.
+
+    Returns:
+        str: The file name followed by the first 12 hex digits of its SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return f"{os.path.basename(path)}@{digest.hexdigest()[:12]}"
+
+
+class _Entry:
+
+    def __init__(self, pattern, mmap_mode):
+        self.pattern = pattern
+        self.mmap_mode = mmap_mode
+        self.current = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+
+class ModelRegistry:
+    """
+    Keeps the prediction models deserialized in memory and shares them across worker threads.
+
+    Each model is registered with a path or a glob pattern; the newest matching artifact is loaded once and
+    swapped atomically when a newer one appears, while the other threads keep serving the previous model.
+    Subscribers are notified of every swap, e.g. to invalidate the predictions of the previous model.
+    """
+
+    def __init__(self, check_interval=5.0):
+        """
+        Args:
+            check_interval (float, optional): Minimum number of seconds between two checks for newer artifacts.
+        """
+        self.check_interval = check_interval
+        self._entries = {}
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        """
+        Registers a function called as `callback(name, loaded)` whenever a model is swapped for a newer
+        artifact, `loaded` being the new `LoadedModel`.
+        """
+        self._subscribers.append(callback)
+
+    def register(self, name, pattern, mmap_mode=None):
+        """
+        Registers a model and loads its newest artifact.
+
+        Args:
+            name (str): Name used to retrieve the model.
+            pattern (str): Path or glob pattern of the artifact, e.g. 'saved/svn_score*.pkl'.
+            mmap_mode (str, optional): Passed to `joblib.load` to memory-map the numpy arrays of the model.
+        """
+        entry = _Entry(pattern, mmap_mode)
+        self._entries[name] = entry
+        self._refresh(entry, name, force=True)
+
+    def get(self, name):
+        """
+        Returns the current model, swapping in a newer artifact if one has appeared.
+
+        Args:
+            name (str): Name of the registered model.
+
+        Returns:
+            object: The deserialized model, or None if no artifact is available.
+        """
+        loaded = self.get_loaded(name)
+        return loaded.model if loaded else None
+
+    def get_loaded(self, name):
+        """
+        Like `get`, but returns the model together with its path and version, read atomically.
+
+        Args:
+            name (str): Name of the registered model.
+
+        Returns:
+            LoadedModel: The current model, or None if no artifact is available.
+        """
+        entry = self._entries[name]
+        self._refresh(entry, name)
+        return entry.current
+
+    def info(self):
+        """
+        Returns the version and load time of every registered model.
+
+        Returns:
+            dict: Model name mapped to its path, version and load time, or None if it is not loaded.
+        """
+        out = {}
+        for name, entry in self._entries.items():
+            current = entry.current
+            out[name] = None if current is None else {
+                'path': current.path,
+                'version': current.version,
+                'loaded_at': current.loaded_at,
+            }
+        return out
+
+    def version(self, name):
+        """
+        Args:
+            name (str): Name of the registered model.
+
+        Returns:
+            str: Version of the current model, or None if it is not loaded.
+        """
+        current = self._entries[name].current
+        return current.version if current else None
+
+    def _refresh(self, entry, name, force=False):
+        now = time.monotonic()
+        if not force and now - entry.checked_at < self.check_interval:
+            return
+
+        # only one thread reloads, the others keep serving the current model
+        if not entry.lock.acquire(blocking=force):
+            return
+        try:
+            entry.checked_at = now
+            candidates = glob.glob(entry.pattern)
+            if not candidates:
+                return
+            path = max(candidates, key=os.path.getmtime)
+            mtime = os.path.getmtime(path)
+
+            current = entry.current
+            if current is not None and current.path == path and current.mtime >= mtime:
+                return
+
+            try:
+                model = joblib.load(path, mmap_mode=entry.mmap_mode)
+            except Exception as e:
+                # the artifact may still be being written, retry at the next check
+                print(f"Could not load {path}: {e}")
+                return
+
+            entry.current = LoadedModel(model=model, path=path, version=artifact_version(path), mtime=mtime,
+                                        loaded_at=datetime.now(timezone.utc).isoformat())
+        finally:
+            entry.lock.release()
+
+        if current is not None:
+            for callback in self._subscribers:
+                callback(name, entry.current)
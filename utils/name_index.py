@@ -0,0 +1,206 @@
+import heapq
+import html
+import unicodedata
+from bisect import bisect_left
+from collections import namedtuple
+from difflib import SequenceMatcher
+
+import numpy as np
+import pandas as pd
+
+from utils.datasets import load_dataset
+
+Suggestion = namedtuple('Suggestion', ['name', 'ticker', 'scored', 'score'])
+
+# trigram candidates reranked by edit similarity, per requested match
+RERANK_FACTOR = 3
+
+
+def fold_name(name):
+    """
+    Folds a company name or ticker for matching: HTML entities are decoded, diacritics removed, case folded
+    and whitespace collapsed, so that 'Nestlé', 'NESTLE' and 'nestle ' give the same key.
+
+    Args:
+        name (str): The company name or ticker.
+
+    Returns:
+        str: The folded key, or an empty string if `name` is missing.
+    """
+    if not isinstance(name, str):
+        return ''
+    decomposed = unicodedata.normalize('NFKD', html.unescape(name))
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.split()).casefold()
+
+
+def trigrams(key):
+    padded = f'  {key} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """
+    Autocomplete and fuzzy-matching index over company names and tickers.
+
+    Prefix queries are a binary search over the sorted folded keys. Fuzzy queries find the companies that
+    share trigrams with the query through an inverted index from trigram to companies, so a lookup only
+    touches the companies that have something in common with the query, then rank the most similar of them
+    by edit similarity.
+    """
+
+    def __init__(self, names, tickers, scored):
+        self.names = list(names)
+        self.tickers = list(tickers)
+        self.scored = np.asarray(scored, dtype=bool)
+
+        keys = []
+        for i, (name, ticker) in enumerate(zip(self.names, self.tickers)):
+            keys.extend((key, i) for key in {fold_name(name), fold_name(ticker)} if key)
+        self._keys = sorted(keys)
+        self._folded = [fold_name(name) for name in self.names]
+        self._exact = {}
+        for key, i in keys:
+            # a company named like the key takes precedence over one with that ticker, then the scored companies
+            rank = (key == self._folded[i], bool(self.scored[i]))
+            j = self._exact.get(key)
+            if j is None or rank > (key == self._folded[j], bool(self.scored[j])):
+                self._exact[key] = i
+
+        postings = {}
+        self._sizes = np.zeros(len(self.names), dtype=np.int64)
+        for i, key in enumerate(self._folded):
+            grams = trigrams(key)
+            self._sizes[i] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(i)
+        self._postings = {gram: np.array(ids, dtype=np.int64) for gram, ids in postings.items()}
+
+    @classmethod
+    def from_files(cls, scored_path, *other_paths):
+        """
+        Builds the index from CSV files with name and ticker columns.
+
+        Args:
+            scored_path (str): File of the companies with an ESG score, e.g. label_with_metrics.csv.
+            *other_paths (str): Files of other known companies, e.g. raw.csv.
+
+        Returns:
+            NameIndex: The index, with one entry per distinct company name.
+        """
+        frames = [load_dataset(scored_path, columns=['name', 'ticker']).assign(scored=True)]
+        frames += [load_dataset(path, columns=['name', 'ticker']).assign(scored=False) for path in other_paths]
+        df = pd.concat(frames, ignore_index=True).dropna(subset=['name']).drop_duplicates('name')
+        return cls(df['name'], df['ticker'].where(df['ticker'].notna(), None), df['scored'])
+
+    def __len__(self):
+        return len(self.names)
+
+    def _suggestion(self, i, score):
+        return Suggestion(self.names[i], self.tickers[i], bool(self.scored[i]), score)
+
+    def prefix(self, query, limit=10):
+        """
+        Returns the companies whose name or ticker starts with `query`, the scored ones and the shortest
+        names first.
+        """
+        key = fold_name(query)
+        start = bisect_left(self._keys, (key,))
+        end = bisect_left(self._keys, (key + '\U0010ffff',))
+        ids = dict.fromkeys(i for _, i in self._keys[start:end])
+        ranked = sorted(ids, key=lambda i: (not self.scored[i], len(self.names[i]), self.names[i]))
+        return [self._suggestion(i, 1.0) for i in ranked[:limit]]
+
+    def fuzzy(self, query, limit=10, threshold=0.3, scored_only=False):
+        """
+        Returns the companies whose name is most similar to `query`: the candidates with the highest Dice
+        similarity of trigrams are ranked by their edit similarity to the query.
+        """
+        key = fold_name(query)
+        query_grams = trigrams(key)
+        grams = [gram for gram in query_grams if gram in self._postings]
+        if not grams:
+            return []
+
+        shared = np.bincount(np.concatenate([self._postings[gram] for gram in grams]), minlength=len(self.names))
+        candidates = np.flatnonzero(shared)
+        if scored_only:
+            candidates = candidates[self.scored[candidates]]
+        scores = 2 * shared[candidates] / (len(query_grams) + self._sizes[candidates])
+
+        shortlist = candidates[np.argsort(-scores, kind='stable')[:max(limit, 1) * RERANK_FACTOR]]
+        matcher = SequenceMatcher(b=key, autojunk=False)
+        # min-heap of the best `limit` matches so far; candidates whose upper bound cannot enter it are skipped
+        best = []
+        for i in shortlist:
+            matcher.set_seq1(self._folded[i])
+            floor = max(threshold, best[0][0]) if best and len(best) >= limit else threshold
+            if matcher.real_quick_ratio() < floor or matcher.quick_ratio() < floor:
+                continue
+            score = matcher.ratio()
+            if score >= floor:
+                entry = (score, bool(self.scored[i]), -i)
+                if len(best) < limit:
+                    heapq.heappush(best, entry)
+                else:
+                    heapq.heappushpop(best, entry)
+        ranked = sorted(best, reverse=True)
+        return [self._suggestion(-i, round(score, 3)) for score, _, i in ranked]
+
+    def suggest(self, query, limit=10):
+        """
+        Prefix matches first, completed with fuzzy matches for misspelled queries.
+
+        Args:
+            query (str): What the user typed.
+            limit (int, optional): Maximum number of suggestions. Defaults to 10.
+
+        Returns:
+            list: `Suggestion` tuples.
+        """
+        suggestions = self.prefix(query, limit)
+        if len(suggestions) < limit:
+            seen = {suggestion.name for suggestion in suggestions}
+            suggestions += [suggestion for suggestion in self.fuzzy(query, limit)
+                            if suggestion.name not in seen][:limit - len(suggestions)]
+        return suggestions
+
+    def resolve(self, name, threshold=0.9, margin=0.05, links=None):
+        """
+        Resolves a misspelled company name or ticker to a scored company.
+
+        A name or ticker of a known company is never remapped: it resolves to itself if the company is scored
+        and to None otherwise. Only names unknown to the index are fuzzy-matched. One typo costs a short name
+        more similarity than a long one, so for a name of n characters the cutoff is lowered to (n - 1) / n,
+        the similarity left by one wrong character. Such a match must beat the other companies by `margin`;
+        among companies as similar as that, the one with the most links wins, if `links` is given.
+
+        Args:
+            name (str): The company name or ticker.
+            threshold (float, optional): Similarity above which the best match is taken. Defaults to 0.9.
+            margin (float, optional): Lead over the other companies required below `threshold`. Defaults to 0.05.
+            links (dict, optional): Company name mapped to its number of links, to break ties.
+
+        Returns:
+            str: The matched company name, or None if the company is known but not scored, or if no scored
+            company is close enough or clearly ahead of the others.
+        """
+        key = fold_name(name)
+        i = self._exact.get(key)
+        if i is not None:
+            return self.names[i] if self.scored[i] else None
+
+        cutoff = min(threshold, (len(key) - 1) / len(key)) if key else threshold
+        matches = self.fuzzy(name, limit=5, threshold=cutoff, scored_only=True)
+        if not matches or matches[0].score >= threshold:
+            return matches[0].name if matches else None
+
+        contenders = [match for match in matches if matches[0].score - match.score < margin]
+        if links is not None:
+            contenders.sort(key=lambda match: links.get(match.name, 0), reverse=True)
+        best = contenders[0]
+        # the same name in another case, e.g. 'Dell' and 'DELL', is not a competing match
+        others = [match for match in contenders[1:] if fold_name(match.name) != fold_name(best.name)]
+        if others and (links is None or links.get(others[0].name, 0) >= links.get(best.name, 0)):
+            return None
+        return best.name
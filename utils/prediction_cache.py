@@ -0,0 +1,112 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def cache_key(*parts):
+    """
+    Hashes the canonical JSON form of the parts of a cache key.
+
+    Args:
+        *parts: JSON-serializable parts, e.g. the model version and the canonicalized input.
+
+    Returns:
+        str: The SHA-256 hex digest.
+    """
+    canonical = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class PredictionCache:
+    """
+    Thread-safe LRU cache of predictions with a time to live.
+
+    Every entry is tagged with the name of the model that produced it, so the entries of one model can be
+    dropped when the model registry swaps its artifact.
+    """
+
+    def __init__(self, max_size=10000, ttl=3600.0):
+        """
+        Args:
+            max_size (int, optional): Maximum number of entries; the least recently used ones are evicted.
+            ttl (float, optional): Seconds after which an entry expires. None to keep entries until evicted.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            object: The cached value, or None if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is not None and entry[1] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, value, model=None):
+        """
+        Args:
+            key (str): The cache key.
+            value (object): The value to cache.
+            model (str, optional): Name of the model that produced the value.
+        """
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (model, expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, model=None):
+        """
+        Drops the entries of a model, or every entry if `model` is None.
+
+        Returns:
+            int: The number of entries dropped.
+        """
+        with self._lock:
+            if model is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+            else:
+                keys = [key for key, entry in self._entries.items() if entry[0] == model]
+                for key in keys:
+                    del self._entries[key]
+                dropped = len(keys)
+        return dropped
+
+    def stats(self):
+        """
+        Returns:
+            dict: The number of entries, the hit and miss counters, the hit rate and the evictions.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'evictions': self.evictions,
+            }
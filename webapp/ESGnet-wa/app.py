@@ -1,21 +1,51 @@
-import joblib
-import networkx as nx
+import html
+import json
+from bisect import bisect_left
+
 import pandas as pd
-from flask import Flask, request, jsonify, render_template
-from data_preparation.cleaning import flatten_dict, clean_decarbonization_target, merge_involvement, \
-    drop_controversies_columns
-from data_preparation.encoding import involvement_encoding, encoding_colors, encoding_aligned_no
-from data_preparation.run import clean_with_metrics, merge_by_esg
-from esg_service_value_network.model.model_svn_score import extract_features
+from flask import Flask, Response, request, jsonify, render_template
+from data_preparation.cleaning import flatten_dict
+from esg_company_data.scoring import predict_payloads, preprocessing_version
+from esg_service_value_network.csr_graph import CSRGraph, FEATURE_COLUMNS, MAX_HOPS
+from esg_service_value_network.features import star_features
+from utils.company_store import CompanyStore
+from utils.datasets import load_dataset
+from utils.model_registry import ModelRegistry
+from utils.name_index import NameIndex, fold_name
+from utils.prediction_cache import PredictionCache, cache_key
 
 app = Flask(__name__)
 
+company_store = CompanyStore('../../data/label_with_metrics.csv')
 
-def load_model(path):
-    try:
-        return joblib.load(path)
-    except FileNotFoundError:
-        return None
+# names and tickers of the scored companies and of every scraped company, for suggestions and fuzzy matching
+name_index = NameIndex.from_files('../../data/label_with_metrics.csv', '../../data/raw.csv')
+
+# the whole links graph, loaded once for the company APIs and the multi-hop neighborhood features
+links_graph = CSRGraph.from_frames(load_dataset('../../data/label_with_metrics.csv'),
+                                   load_dataset('../../data/filtered_links.csv'))
+
+# companies with at least one link, sorted by folded name for the prefix search
+linked_companies = sorted(((fold_name(name), name) for name, degree in zip(links_graph.names, links_graph.degree)
+                           if degree > 0))
+
+# number of links of each company, to break the ties between equally close fuzzy matches
+link_counts = dict(zip(links_graph.names, links_graph.degree.tolist()))
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+model_registry = ModelRegistry()
+model_registry.register('svn', '../../esg_service_value_network/model/saved/svn_score*.pkl')
+model_registry.register('data', '../../esg_company_data/saved/data_score*.pkl')
+
+# predictions of identical inputs, dropped when the model that produced them is swapped
+prediction_cache = PredictionCache(max_size=10000, ttl=3600)
+model_registry.subscribe(lambda name, loaded: prediction_cache.invalidate(name))
+
+# what the preprocessing of the company-data model raises on a malformed payload, e.g. AttributeError from the
+# string methods on a number
+PAYLOAD_ERRORS = (AttributeError, KeyError, TypeError, ValueError)
 
 
 @app.route('/')
@@ -33,28 +63,122 @@ def from_svn():
     return render_template('svn.html')
 
 
-def get_esg_value(company_name):
-    df = pd.read_csv('../../data/label_with_metrics.csv')
-    esg_value = df.loc[df['name'] == company_name, 'esg'].values
-    if len(esg_value) > 0:
-        return esg_value[0]
-    else:
-        return None
+def svn_feature_names(model):
+    # models trained on a DataFrame remember the order of their features
+    names = getattr(model, 'feature_names_in_', None)
+    return list(names) if names is not None else FEATURE_COLUMNS
+
+
+def resolve_companies(companies):
+    """
+    Matches the companies unknown to the company store to the closest scored company, so that a misspelled
+    neighbor does not silently count as a company without ESG score.
+
+    Returns:
+        tuple: The companies with the misspelled names replaced, and the replacements made.
+    """
+    resolved = {}
+    for company, position in zip(companies, company_store.positions(companies)):
+        if position < 0 and company not in resolved:
+            match = name_index.resolve(company, links=link_counts)
+            if match is not None:
+                resolved[company] = match
+    return [resolved.get(company, company) for company in companies], resolved
+
+
+def predict_data_payloads(model, payloads):
+    """
+    Predicts the companies with a single call to the model. When a malformed payload breaks the batch, the
+    companies are predicted one at a time, so that it only fails itself.
+
+    Returns:
+        list: The prediction of each payload, or the error its preprocessing raised.
+    """
+    try:
+        return [float(prediction) for prediction in predict_payloads(model, payloads)]
+    except PAYLOAD_ERRORS:
+        pass
+
+    results = []
+    for payload in payloads:
+        try:
+            results.append(float(predict_payloads(model, [payload])[0]))
+        except PAYLOAD_ERRORS as e:
+            results.append(e)
+    return results
+
+
+def payload_error(error):
+    if isinstance(error, KeyError):
+        return f'Missing field {error}'
+    return f'Invalid company data: {error}'
+
+
+def svn_feature_vector(companies, relationships, feature_names, esg_values=None):
+    if esg_values is None:
+        esg_values = company_store.esg_values(companies)
+    features = star_features(companies, relationships, esg_values)
+    return [features[feature_name] for feature_name in feature_names]
+
+
+def svn_cache_key(loaded, companies, relationships):
+    # the star features only depend on the last relationship of each distinct company and on its ESG score
+    links = {company: relationships[i] if i < len(relationships) else 'unknown' for i, company in enumerate(companies)}
+    return cache_key('svn', loaded.version, company_store.version, sorted(links.items(), key=str))
+
+
+def data_cache_key(loaded, preprocessing, payload):
+    # the metric weights are reloaded when their file changes, so they are part of the key like the model
+    return cache_key('data', loaded.version, preprocessing, flatten_dict(payload))
+
+
+def page_args():
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    return offset, limit
 
 
-def construct_graph(companies, relationships):
-    G = nx.Graph()
-    G.add_node('TARGET')
+def page(items, total, offset, limit):
+    return {'items': items, 'total': total, 'offset': offset, 'limit': limit}
 
-    for i, company in enumerate(companies):
-        esg_value = get_esg_value(company)
-        G.add_node(company, esg=esg_value)
-        rel_type = relationships[i] if i < len(relationships) else 'unknown'
-        G.add_edge('TARGET', company, relationship=rel_type)
 
-    print(f"Graph : {G}")
+@app.route('/api/companies')
+def companies():
+    prefix = fold_name(request.args.get('prefix', ''))
+    offset, limit = page_args()
 
-    return G
+    start = bisect_left(linked_companies, (prefix,))
+    end = bisect_left(linked_companies, (prefix + '\U0010ffff',))
+    matches = linked_companies[start + offset:min(start + offset + limit, end)]
+    items = [{'name': name, 'label': html.unescape(name)} for _, name in matches]
+    return jsonify(page(items, end - start, offset, limit))
+
+
+@app.route('/api/suggest')
+def suggest():
+    query = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', 10, type=int), 1), MAX_PAGE_SIZE)
+
+    if not query.strip():
+        return jsonify({'items': []})
+
+    items = [{'name': suggestion.name, 'label': html.unescape(suggestion.name), 'ticker': suggestion.ticker,
+              'scored': suggestion.scored, 'score': suggestion.score}
+             for suggestion in name_index.suggest(query, limit)]
+    return jsonify({'items': items})
+
+
+@app.route('/api/links/<path:company>')
+def links(company):
+    neighbors = links_graph.neighbors(company)
+
+    if neighbors is None:
+        return jsonify({'error': 'Company not found'}), 404
+
+    offset, limit = page_args()
+    items = [{'name': name, 'label': html.unescape(name), 'type': rel_type}
+             for name, rel_type in neighbors[offset:offset + limit]]
+    return jsonify({'company': company, **page(items, len(neighbors), offset, limit)})
 
 
 @app.route('/predict/svn', methods=['POST'])
@@ -62,31 +186,112 @@ def predict():
     data = request.get_json()
     companies = data.get('companies', [])
     relationships = data.get('relationships', [])
+    hops = data.get('hops')
 
     if not companies or not relationships:
         return jsonify({'error': 'List of companies and relationships is required'}), 400
 
-    graph = construct_graph(companies, relationships)
-    features = extract_features(graph, 'TARGET')
-    print(f"Features: {features}")
+    if hops is not None and (not isinstance(hops, int) or isinstance(hops, bool) or not 1 <= hops <= MAX_HOPS):
+        return jsonify({'error': f'hops must be an integer between 1 and {MAX_HOPS}'}), 400
 
-    model = load_model(path='../../esg_service_value_network/model/saved/svn_score.pkl')
+    loaded = model_registry.get_loaded('svn')
 
-    if not model:
+    if not loaded:
         return jsonify({'error': 'Model not found'}), 500
 
-    feature_names = ['num_links', 'mean_esg_neighbors', 'var_esg_neighbors', 'sum_esg_neighbors', 'sum_partnership',
-                     'sum_customers', 'sum_investment', 'sum_competitor']
+    companies, resolved = resolve_companies(companies)
+
+    key = svn_cache_key(loaded, companies, relationships)
+    prediction = prediction_cache.get(key)
+    if prediction is None:
+        feature_names = svn_feature_names(loaded.model)
+        X = svn_feature_vector(companies, relationships, feature_names)
+        prediction = loaded.model.predict(pd.DataFrame([X], columns=feature_names))[0]
 
-    X = [features[feature_name] for feature_name in feature_names]
-    print(f"X: {X}")
-    prediction = model.predict([X])[0]
+        # Round the prediction to two decimal places
+        prediction = round(float(prediction), 2)
+        prediction_cache.put(key, prediction, 'svn')
+
+    response = {'esg': prediction}
+    if resolved:
+        response['resolved'] = resolved
+    if hops is not None:
+        response['neighborhood'] = links_graph.neighborhood_features(companies, relationships, hops=hops)
 
-    # Round the prediction to two decimal places
-    prediction = round(prediction, 2)
-    print(prediction)
     # Render the result template with the prediction
-    return jsonify({'esg': prediction})
+    return jsonify(response)
+
+
+@app.route('/predict/svn/batch', methods=['POST'])
+def predict_batch():
+    data = request.get_json()
+    targets = data.get('targets', []) if isinstance(data, dict) else []
+
+    if not targets:
+        return jsonify({'error': 'List of targets is required'}), 400
+
+    loaded = model_registry.get_loaded('svn')
+
+    if not loaded:
+        return jsonify({'error': 'Model not found'}), 500
+
+    valid, errors = [], {}
+    for i, target in enumerate(targets):
+        if isinstance(target, dict) and target.get('companies') and target.get('relationships'):
+            valid.append(i)
+        else:
+            errors[i] = 'List of companies and relationships is required'
+
+    # resolve the neighbors of every target with a single lookup
+    all_companies = [company for i in valid for company in targets[i]['companies']]
+    all_companies, resolved = resolve_companies(all_companies)
+    all_esg = company_store.esg_values(all_companies)
+
+    feature_names = svn_feature_names(loaded.model)
+    esg_by_target, keys, rows, offset = {}, {}, [], 0
+    for i in valid:
+        n = len(targets[i]['companies'])
+        companies = all_companies[offset:offset + n]
+        esg_values = all_esg[offset:offset + n]
+        offset += n
+
+        keys[i] = svn_cache_key(loaded, companies, targets[i]['relationships'])
+        cached = prediction_cache.get(keys[i])
+        if cached is not None:
+            esg_by_target[i] = cached
+        else:
+            rows.append((i, svn_feature_vector(companies, targets[i]['relationships'], feature_names, esg_values)))
+
+    # only the targets missing from the cache go through the model
+    if rows:
+        predictions = loaded.model.predict(pd.DataFrame([X for _, X in rows], columns=feature_names))
+        for (i, _), prediction in zip(rows, predictions):
+            esg_by_target[i] = round(float(prediction), 2)
+            prediction_cache.put(keys[i], esg_by_target[i], 'svn')
+
+    def generate():
+        for i in range(len(targets)):
+            if i in errors:
+                line = {'index': i, 'error': errors[i]}
+            else:
+                line = {'index': i, 'esg': esg_by_target[i]}
+                corrections = {company: resolved[company] for company in targets[i]['companies']
+                               if company in resolved}
+                if corrections:
+                    line['resolved'] = corrections
+            yield json.dumps(line) + '\n'
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+
+@app.route('/api/models')
+def models():
+    return jsonify(model_registry.info())
+
+
+@app.route('/api/cache')
+def cache_stats():
+    return jsonify(prediction_cache.stats())
 
 
 @app.route('/result')
@@ -98,45 +303,60 @@ def result():
 @app.route('/predict/data', methods=['POST'])
 def predict_data():
     data = request.get_json()
-    flattened_data = flatten_dict(data)
 
-    df = pd.DataFrame({key: [value] for key, value in flattened_data.items()})
+    loaded = model_registry.get_loaded('data')
 
-    column_mappings = {
-        'Decarbonization_Target_target_year': 'Decarbonization_Target_target_year',
-        'Decarbonization_Target_comprehensiveness': 'Decarbonization_Target_Comprehensiveness',
-        'Decarbonization_Target_ambition_per_annum': 'Decarbonization_Target_Ambition p.a.',
-        'Decarbonization_Target_temperature_goal': 'Temperature Goal',
-    }
-    df = df.rename(columns=column_mappings)
+    if not loaded:
+        return jsonify({'error': 'Model not found'}), 500
 
-    # Perform necessary cleaning and transformations
-    df = clean_decarbonization_target(df)
-    df = merge_involvement(df)
-    df = involvement_encoding(df)
-    df = encoding_colors(df)
-    df = encoding_aligned_no(df)
-    df = merge_by_esg(df)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Company data is required'}), 400
 
-    model = load_model(path='../../esg_company_data/saved/data_score.pkl')
+    key = data_cache_key(loaded, preprocessing_version(), data)
+    prediction = prediction_cache.get(key)
+    if prediction is None:
+        prediction = predict_data_payloads(loaded.model, [data])[0]
+        if isinstance(prediction, Exception):
+            return jsonify({'error': payload_error(prediction)}), 400
+        prediction_cache.put(key, prediction, 'data')
 
-    if not model:
-        return jsonify({'error': 'Model not found'}), 500
+    return jsonify({'esg': prediction})
 
-    desired_feature_order = ['employees', 'altman_score', 'piotroski_score',
-                             'Decarbonization Target_Target Year',
-                             'Decarbonization Target_Comprehensiveness',
-                             'Decarbonization Target_Ambition p.a.', 'Temperature Goal',
-                             'environmental_metric', 'social_metric', 'governance_metric',
-                             'involvement_metric']
 
-    df = df.reindex(columns=desired_feature_order)
-    X = df.values
+@app.route('/predict/data/batch', methods=['POST'])
+def predict_data_batch():
+    data = request.get_json()
+    companies = data.get('companies', []) if isinstance(data, dict) else []
 
-    prediction = model.predict(X)[0]
-    prediction = round(prediction, 2)
+    if not companies or not all(isinstance(company, dict) for company in companies):
+        return jsonify({'error': 'List of companies is required'}), 400
 
-    return jsonify({'esg': prediction})
+    loaded = model_registry.get_loaded('data')
+
+    if not loaded:
+        return jsonify({'error': 'Model not found'}), 500
+
+    preprocessing = preprocessing_version()
+    keys = [data_cache_key(loaded, preprocessing, company) for company in companies]
+    predictions = [prediction_cache.get(key) for key in keys]
+
+    # only the companies missing from the cache go through the preprocessing and the model
+    missing = [i for i, prediction in enumerate(predictions) if prediction is None]
+    errors = {}
+    if missing:
+        for i, result in zip(missing, predict_data_payloads(loaded.model, [companies[i] for i in missing])):
+            if isinstance(result, Exception):
+                errors[i] = payload_error(result)
+            else:
+                predictions[i] = result
+                prediction_cache.put(keys[i], predictions[i], 'data')
+
+    def generate():
+        for i, prediction in enumerate(predictions):
+            line = {'index': i, 'error': errors[i]} if i in errors else {'index': i, 'esg': prediction}
+            yield json.dumps(line) + '\n'
+
+    return Response(generate(), mimetype='application/x-ndjson')
 
 
 if __name__ == '__main__':
@@ -1,85 +1,82 @@
-document.getElementById('number-of-company').addEventListener('input', function() {
-    const numberOfCompanies = parseInt(this.value, 10);
-    const dynamicFieldsContainer = document.getElementById('dynamic-fields');
-    dynamicFieldsContainer.innerHTML = '';
+// company labels shown in the form mapped to the names the server knows them by
+const companyNames = {};
 
-    if (!isNaN(numberOfCompanies) && numberOfCompanies > 0) {
-        const csvPath = '../static/js/filtered_links.csv';
+function fetchCompanies(query, datalist) {
+    // linked companies until the user types, then suggestions that tolerate typos
+    const url = query.trim() ? '/api/suggest?limit=20&q=' + encodeURIComponent(query) : '/api/companies?limit=20';
 
-        // Make a request to fetch the CSV file
-        const xhr = new XMLHttpRequest();
-        xhr.open('GET', csvPath, true);
-        xhr.onreadystatechange = function() {
-            if (xhr.readyState === 4) {
-                if (xhr.status === 200) {
-                    // Parse CSV data
-                    const csvData = xhr.responseText;
-                    const rows = csvData.split('\n');
-                    const companyNames = new Set();
+    fetch(url)
+        .then(response => response.json())
+        .then(data => {
+            datalist.innerHTML = '';
+            data.items.forEach(company => {
+                companyNames[company.label] = company.name;
 
-                    // Skip the first row
-                    rows.slice(1).forEach(row => {
-                        const columns = row.split(',');
-                        if (columns.length >= 2) {
-                            let homeName = he.decode(columns[0].trim());
-                            let linkName = he.decode(columns[1].trim());
+                const companyOption = document.createElement('option');
+                companyOption.value = company.label;
+                datalist.appendChild(companyOption);
+            });
+        })
+        .catch(error => {
+            console.error('Failed to fetch the companies:', error);
+        });
+}
 
-                            // Remove leading apostrophe
-                            homeName = homeName.replace(/^"/, '');
-                            linkName = linkName.replace(/^"/, '');
+function companyName(label) {
+    return companyNames[label] || label;
+}
 
-                            companyNames.add(homeName);
-                            companyNames.add(linkName);
-                        }
-                    });
+document.getElementById('number-of-company').addEventListener('input', function() {
+    const numberOfCompanies = parseInt(this.value, 10);
+    const dynamicFieldsContainer = document.getElementById('dynamic-fields');
+    dynamicFieldsContainer.innerHTML = '';
 
-                    // Convert the set to an array and sort it alphabetically
-                    const sortedCompanyNames = Array.from(companyNames).sort();
+    if (!isNaN(numberOfCompanies) && numberOfCompanies > 0) {
+        // Create dynamic fields, suggesting companies from the server as the user types
+        for (let i = 0; i < numberOfCompanies; i++) {
+            const datalist = document.createElement('datalist');
+            datalist.id = `companies-${i+1}`;
 
-                    // Create dynamic fields based on the retrieved service options
-                    for (let i = 0; i < numberOfCompanies; i++) {
-                        // Create the select field for the companies
-                        const companySelect = document.createElement('select');
-                        companySelect.name = `company-${i+1}`;
-                        companySelect.classList.add('form-select', 'form-control', 'mb-2');
+            const companyInput = document.createElement('input');
+            companyInput.type = 'text';
+            companyInput.name = `company-${i+1}`;
+            companyInput.placeholder = 'Company';
+            companyInput.autocomplete = 'off';
+            companyInput.setAttribute('list', datalist.id);
+            companyInput.classList.add('form-control', 'mb-2');
 
-                        sortedCompanyNames.forEach(companyName => {
-                            const companyOption = document.createElement('option');
-                            companyOption.value = companyName;
-                            companyOption.textContent = companyName;
-                            companySelect.appendChild(companyOption);
-                        });
+            let timer = null;
+            companyInput.addEventListener('input', function() {
+                clearTimeout(timer);
+                timer = setTimeout(() => fetchCompanies(companyInput.value, datalist), 150);
+            });
+            fetchCompanies('', datalist);
 
-                        // Append the companySelect to the dynamic fields container
-                        dynamicFieldsContainer.appendChild(companySelect);
+            // Append the companyInput to the dynamic fields container
+            dynamicFieldsContainer.appendChild(companyInput);
+            dynamicFieldsContainer.appendChild(datalist);
 
-                        // Create the select field for the type
-                        const typeSelect = document.createElement('select');
-                        typeSelect.name = `type-${i+1}`;
-                        typeSelect.classList.add('form-select', 'form-control', 'mb-2');
+            // Create the select field for the type
+            const typeSelect = document.createElement('select');
+            typeSelect.name = `type-${i+1}`;
+            typeSelect.classList.add('form-select', 'form-control', 'mb-2');
 
-                        const typeOptions = [
-                            { value: 'customer', text: 'customer' },
-                            { value: 'partnership', text: 'partnership' },
-                            { value: 'investment', text: 'investment' },
-                            { value: 'competitor', text: 'competitor' },
-                        ];
+            const typeOptions = [
+                { value: 'customer', text: 'customer' },
+                { value: 'partnership', text: 'partnership' },
+                { value: 'investment', text: 'investment' },
+                { value: 'competitor', text: 'competitor' },
+            ];
 
-                        typeOptions.forEach(optionData => {
-                            const option = document.createElement('option');
-                            option.value = optionData.value;
-                            option.textContent = optionData.text;
-                            typeSelect.appendChild(option);
-                        });
+            typeOptions.forEach(optionData => {
+                const option = document.createElement('option');
+                option.value = optionData.value;
+                option.textContent = optionData.text;
+                typeSelect.appendChild(option);
+            });
 
-                        // Append the typeSelect to the dynamic fields container
-                        dynamicFieldsContainer.appendChild(typeSelect);
-                    }
-                } else {
-                    console.error('Failed to fetch CSV file. Please check the path and try again.');
-                }
-            }
-        };
-        xhr.send();
+            // Append the typeSelect to the dynamic fields container
+            dynamicFieldsContainer.appendChild(typeSelect);
+        }
     }
 });